@@ -0,0 +1,271 @@
+"""
+Асинхронные представления для чтения рецептов, справочников и подписок.
+
+Под ASGI-сервером запрос не занимает поток на время ожидания базы данных:
+запросы выполняются асинхронными методами ORM (aget, acount, aiterator,
+async for), а ответы формируются теми же сериализаторами, что и в
+синхронных представлениях DRF, поэтому совпадают с ними по формату.
+Запросы с другими методами, курсорная пагинация и кэшированные ответы
+анонимным пользователям передаются синхронным представлениям.
+Подключаются настройкой ASYNC_READ_VIEWS (см. api/urls.py).
+"""
+import asyncio
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.translation import gettext_lazy as _
+from recipes.db_router import (is_recent, primary_reads, read_database,
+                               replica_for)
+from recipes.models import Ingredient, Tag
+from recipes.versioning import get_modified, get_version
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .mixins import catalog_cache_key, catalog_etag, set_catalog_headers
+from .pagination import RecipePagination, apaginate_by_number
+from .serializers import SubscriptionSerializer
+from .utils import get_recipes_previews
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                    UserViewSet, subscribed_authors)
+
+renderer = JSONRenderer()
+
+# Ограничивает число одновременно обрабатываемых запросов, а значит
+# и открытых ими соединений с базой данных, в каждом процессе.
+db_connections = asyncio.Semaphore(settings.ASYNC_DB_CONNECTIONS)
+
+
+class SyncFallback(Exception):
+    """Запрос нужно передать синхронному представлению DRF."""
+
+
+class AsyncTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с асинхронной проверкой ключа."""
+
+    def authenticate_credentials(self, key):
+        # Заголовок разбирает authenticate, ключ проверяет aauthenticate.
+        return key
+
+    async def aauthenticate(self, request):
+        key = self.authenticate(request)
+        if key is None:
+            return None
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return token.user, token
+
+
+authentication = AsyncTokenAuthentication()
+
+
+def render(data, status=200):
+    return HttpResponse(
+        renderer.render(data), status=status,
+        content_type=renderer.media_type)
+
+
+def error_response(exc):
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    response = render(data, exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated,
+                        exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = authentication.authenticate_header(
+            None)
+    return response
+
+
+async def get_request(request):
+    """Request DRF с пользователем, найденным по токену асинхронно."""
+    user, auth = await authentication.aauthenticate(request) or (
+        AnonymousUser(), None)
+    request = Request(request)
+    request.user, request.auth = user, auth
+    # Значение сбрасывается в as_view после обработки запроса.
+    if user.is_authenticated:
+        read_database.set(await sync_to_async(replica_for)(user))
+    else:
+        read_database.set(replica_for(user))
+    return request
+
+
+def get_view(viewset, request, action, **kwargs):
+    """Экземпляр ViewSet для его get_queryset, фильтров и сериализаторов."""
+    return viewset(
+        request=request, action=action, args=(), kwargs=kwargs,
+        format_kwarg=None)
+
+
+async def aget_object(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise exceptions.NotFound
+
+
+def use_response_cache(request):
+    return (
+        settings.RECIPE_CACHE_ENABLED
+        and 'HTTP_AUTHORIZATION' not in request.META
+    )
+
+
+def as_view(handler, sync_view):
+    """
+    Представление, которое обрабатывает GET-запросы асинхронным handler,
+    а остальные запросы - синхронным представлением DRF sync_view.
+    Соединение с базой данных закрывается до освобождения места
+    в db_connections.
+    """
+    run_sync_view = sync_to_async(sync_view)
+
+    @wraps(handler)
+    async def view(request, *args, **kwargs):
+        async with db_connections:
+            try:
+                if request.method != 'GET':
+                    raise SyncFallback
+                with primary_reads():
+                    return await handler(request, *args, **kwargs)
+            except SyncFallback:
+                return await run_sync_view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+            finally:
+                await sync_to_async(close_old_connections)()
+
+    # csrf_exempt в Django 4.1 делает из корутины синхронную функцию.
+    view.csrf_exempt = True
+    # Имена эндпоинтов для QueryProfilingMiddleware.
+    view.cls, view.actions = sync_view.cls, sync_view.actions
+    return view
+
+
+async def recipe_list(request):
+    if (RecipePagination.cursor_query_param in request.GET
+            or use_response_cache(request)):
+        raise SyncFallback
+    request = await get_request(request)
+    view = get_view(RecipeViewSet, request, 'list')
+    # Фильтры проверяют значения параметров запросами к базе данных.
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    pagination = view.paginator
+    page = await pagination.apaginate_queryset(queryset, request)
+    serializer = view.get_serializer(page, many=True)
+    return render(pagination.get_paginated_response(serializer.data).data)
+
+
+async def recipe_detail(request, pk):
+    if use_response_cache(request):
+        raise SyncFallback
+    request = await get_request(request)
+    view = get_view(RecipeViewSet, request, 'retrieve', pk=pk)
+    recipe = await aget_object(view.get_queryset(), pk=pk)
+    return render(view.get_serializer(recipe).data)
+
+
+def get_catalog_state(model):
+    return get_version(model), get_modified(model)
+
+
+async def catalog_response(request, model, load):
+    """Асинхронный вариант CatalogCacheMixin.cached_response."""
+    version, last_modified = await sync_to_async(get_catalog_state)(model)
+    etag = catalog_etag(version, renderer.format, request.get_full_path())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        cache_key = catalog_cache_key(model, etag)
+        data = await cache.aget(cache_key)
+        if data is None:
+            recent = is_recent(last_modified)
+            with primary_reads() if recent else nullcontext():
+                data = await load()
+            await cache.aset(
+                cache_key, data, settings.CATALOG_CACHE_TIMEOUT)
+        response = render(data)
+    return set_catalog_headers(response, etag, last_modified)
+
+
+async def tag_list(request):
+    request = await get_request(request)
+
+    async def load():
+        view = get_view(TagViewSet, request, 'list')
+        tags = [tag async for tag in view.get_queryset().aiterator()]
+        return view.get_serializer(tags, many=True).data
+
+    return await catalog_response(request, Tag, load)
+
+
+async def tag_detail(request, pk):
+    request = await get_request(request)
+
+    async def load():
+        view = get_view(TagViewSet, request, 'retrieve', pk=pk)
+        tag = await aget_object(view.get_queryset(), pk=pk)
+        return view.get_serializer(tag).data
+
+    return await catalog_response(request, Tag, load)
+
+
+async def ingredient_list(request):
+    request = await get_request(request)
+
+    async def load():
+        view = get_view(IngredientViewSet, request, 'list')
+        # Поиск по индексу в памяти при первом обращении строит индекс.
+        ingredients = await sync_to_async(view.filter_queryset)(
+            view.get_queryset())
+        if isinstance(ingredients, QuerySet):
+            ingredients = [
+                ingredient async for ingredient in ingredients.aiterator()]
+        return view.get_serializer(ingredients, many=True).data
+
+    return await catalog_response(request, Ingredient, load)
+
+
+async def ingredient_detail(request, pk):
+    request = await get_request(request)
+
+    async def load():
+        view = get_view(IngredientViewSet, request, 'retrieve', pk=pk)
+        ingredient = await aget_object(view.get_queryset(), pk=pk)
+        return view.get_serializer(ingredient).data
+
+    return await catalog_response(request, Ingredient, load)
+
+
+async def subscriptions(request):
+    request = await get_request(request)
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated
+    recipes_limit = SubscriptionSerializer.get_recipes_limit(request)
+    view = get_view(UserViewSet, request, 'subscriptions')
+    pagination = view.paginator
+    page = await apaginate_by_number(
+        pagination, subscribed_authors(request.user), request)
+    previews = await sync_to_async(get_recipes_previews)(
+        [author.pk for author in page], recipes_limit)
+    for author in page:
+        author.recipes_preview = previews[author.pk]
+    serializer = view.get_serializer(page, many=True)
+    return render(pagination.get_paginated_response(serializer.data).data)
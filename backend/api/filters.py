@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Case, IntegerField, Q, Value, When
 from django_filters import rest_framework as filters
-from recipes.models import Recipe, Tag
+from recipes.ingredient_index import ingredient_index
+from recipes.models import CartItem, Favorite, Recipe, Tag
+from recipes.search import search_recipes
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
 
 User = get_user_model()
 
@@ -10,7 +16,8 @@ class RecipeFilter(filters.FilterSet):
     tags = filters.filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
-        to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags',
     )
 
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
@@ -25,26 +32,78 @@ class RecipeFilter(filters.FilterSet):
         method='filter_shopping_cart',
     )
 
-    def filter_queryset(self, queryset):
-        queryset = super().filter_queryset(queryset)
-        if self.request.user.is_anonymous:
-            return queryset.exclude(is_private=True)
-        return queryset
+    search = filters.CharFilter(method='filter_search')
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        # Без параметра tags value - пустой QuerySet, а не пустой список.
+        if not value:
+            return queryset
+        # Подзапрос вместо JOIN: рецепт с несколькими выбранными тегами
+        # не дублируется, и DISTINCT не нужен.
+        return queryset.filter(pk__in=Recipe.tags.through.objects.filter(
+            tag__in=value).values('recipe'))
 
     def filter_favorited(self, queryset, name, value):
         if self.request.user.is_anonymous:
             return queryset.none()
         if value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(pk__in=Favorite.objects.filter(
+                user=self.request.user).values('recipe'))
         return queryset
 
     def filter_shopping_cart(self, queryset, name, value):
         if self.request.user.is_anonymous:
             return queryset.none()
         if value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(pk__in=CartItem.objects.filter(
+                user=self.request.user).values('recipe'))
         return queryset
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags',)
+
+
+class IngredientSearchFilter(BaseFilterBackend):
+    """
+    Поиск ингредиентов по названию для автодополнения.
+    Сначала выдаются совпадения по началу названия, затем по вхождению.
+    При INGREDIENT_INDEX_ENABLED поиск выполняется по индексу в памяти
+    процесса, иначе через ORM: на PostgreSQL запрос обслуживается
+    индексами из миграции recipes.0005, на SQLite - без индексов.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    limit_param = 'limit'
+    default_limit = 50
+    max_limit = 200
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term or getattr(view, 'action', None) != 'list':
+            return queryset
+        if settings.INGREDIENT_INDEX_ENABLED:
+            return ingredient_index.search(term, self.get_limit(request))
+        # Префиксное условие дублирует icontains, но позволяет PostgreSQL
+        # объединить btree- и trigram-индексы через BitmapOr.
+        return queryset.filter(
+            Q(name__istartswith=term) | Q(name__icontains=term)
+        ).annotate(
+            prefix_match=Case(
+                When(name__istartswith=term, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('prefix_match', 'name')[:self.get_limit(request)]
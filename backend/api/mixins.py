@@ -0,0 +1,194 @@
+import hashlib
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+from recipes.db_router import (is_recent, primary_reads, read_database,
+                               recently_modified, replica_for,
+                               stick_to_primary)
+from recipes.models import Ingredient, Tag
+from recipes.versioning import get_modified, get_version
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+
+def catalog_etag(version, response_format, path):
+    key = f'{version}:{response_format}:{path}'
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def catalog_cache_key(model, etag):
+    return f'api:catalog:{model._meta.model_name}:{etag}'
+
+
+def set_catalog_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(
+        response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE)
+    return response
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы читают данные с реплики, если она настроена
+    (DB_REPLICA_HOST или DB_REPLICA_NAME); replica_actions ограничивает
+    действия, которые читают с реплики. После изменяющего запроса
+    пользователь некоторое время читает с основной БД.
+    """
+    replica_actions = None
+    _read_database = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS:
+            return
+        if self.replica_actions is None or self.action in self.replica_actions:
+            self._read_database = read_database.set(
+                replica_for(request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._read_database is not None:
+            read_database.reset(self._read_database)
+            self._read_database = None
+        if request.method not in SAFE_METHODS:
+            stick_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CatalogCacheMixin:
+    """
+    Условные GET-запросы и кэширование ответов для справочников.
+
+    ETag строится из версии данных модели, формата ответа и URL, поэтому
+    совпадает у всех воркеров, пока справочник не изменится.
+    Сериализованные данные хранятся в кэше Django под тем же ключом
+    и переиспользуются между запросами.
+    """
+
+    def get_catalog_etag(self, request, version):
+        return catalog_etag(
+            version, request.accepted_renderer.format,
+            request.get_full_path())
+
+    def _set_cache_headers(self, response, etag, last_modified):
+        return set_catalog_headers(response, etag, last_modified)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        model = self.queryset.model
+        version = get_version(model)
+        last_modified = get_modified(model)
+        etag = self.get_catalog_etag(request, version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return self._set_cache_headers(response, etag, last_modified)
+        cache_key = catalog_cache_key(model, etag)
+        data = cache.get(cache_key)
+        if data is None:
+            recent = is_recent(last_modified)
+            with primary_reads() if recent else nullcontext():
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(cache_key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        return self._set_cache_headers(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs)
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширование ответов list/retrieve для анонимных пользователей.
+
+    Ответ анонимному пользователю не зависит от пользователя, поэтому
+    ключ строится из нормализованной строки запроса (параметры и их
+    значения отсортированы) и версий данных: список сбрасывается при
+    любом изменении рецептов, тегов или ингредиентов, рецепт - при
+    изменении его самого, его автора, тегов или ингредиентов.
+    Включается настройкой RECIPE_CACHE_ENABLED и требует общего для
+    процессов кэша: версии меняют и management-команды.
+    """
+    hits_key = 'api:recipes:cache:hits'
+    misses_key = 'api:recipes:cache:misses'
+
+    @staticmethod
+    def normalize_query(request):
+        return urlencode(sorted(
+            (key, value)
+            for key in request.query_params
+            for value in request.query_params.getlist(key)
+        ))
+
+    def get_response_cache_key(self, request, **kwargs):
+        model = self.queryset.model
+        base_url = request.build_absolute_uri(request.path)
+        key = (
+            f'{request.accepted_renderer.format}:{base_url}?'
+            f'{self.normalize_query(request)}'
+        )
+        digest = hashlib.md5(key.encode()).hexdigest()
+        catalogs = f'{get_version(Tag)}:{get_version(Ingredient)}'
+        if self.action == 'retrieve':
+            pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+            return (
+                f'api:recipes:detail:{pk}:{get_version(model, pk)}:'
+                f'{catalogs}:{digest}'
+            )
+        return f'api:recipes:list:{get_version(model)}:{catalogs}:{digest}'
+
+    @classmethod
+    def _count(cls, key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+    @classmethod
+    def get_cache_stats(cls):
+        return {
+            'hits': cache.get(cls.hits_key, 0),
+            'misses': cache.get(cls.misses_key, 0),
+        }
+
+    @classmethod
+    def reset_cache_stats(cls):
+        cache.delete_many((cls.hits_key, cls.misses_key))
+
+    def cached_anonymous_response(self, request, handler, *args, **kwargs):
+        if not settings.RECIPE_CACHE_ENABLED or request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        cache_key = self.get_response_cache_key(request, **kwargs)
+        data = cache.get(cache_key)
+        if data is not None:
+            self._count(self.hits_key)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        self._count(self.misses_key)
+        recent = recently_modified(self.queryset.model, Tag, Ingredient)
+        with primary_reads() if recent else nullcontext():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_anonymous_response(
+            request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_anonymous_response(
+            request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,174 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage, Page
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по плану запроса PostgreSQL (EXPLAIN),
+    без выполнения COUNT(*). Для других СУБД возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return plan[0]['Plan']['Plan Rows']
+
+
+async def apaginate_by_number(pagination, queryset, request, count=None):
+    """
+    Асинхронный вариант PageNumberPagination.paginate_queryset:
+    COUNT(*) и выборка страницы выполняются асинхронными методами ORM.
+    После вызова работает get_paginated_response пагинатора.
+    """
+    page_size = pagination.get_page_size(request)
+    paginator = DjangoPaginator(queryset, page_size)
+    paginator.count = await queryset.acount() if count is None else count
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        number = paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(
+            page_number=page_number, message=str(exc)))
+    offset = (number - 1) * page_size
+    pagination.page = Page(
+        [obj async for obj in queryset[offset:offset + page_size]],
+        number, paginator)
+    pagination.request = request
+    return list(pagination.page)
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Пагинатор, который для больших выборок заменяет COUNT(*)
+    оценкой планировщика. Небольшие выборки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if (estimate is None
+                or estimate < settings.RECIPE_COUNT_ESTIMATE_THRESHOLD):
+            return super().count
+        return estimate
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class RecipePagination(PageNumberPagination):
+    """
+    Постраничная навигация ленты рецептов.
+
+    По умолчанию используются номера страниц (?page=), как ожидает
+    фронтенд. Подсчет общего количества задается настройкой
+    RECIPE_PAGINATION_COUNT: 'exact' - COUNT(*), 'estimate' - оценка
+    планировщика для больших выборок, 'none' - без подсчета (count=null).
+    Параметр ?cursor= переключает запрос на курсорную пагинацию по -id,
+    которая не выполняет COUNT(*) и OFFSET.
+    """
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_pagination = RecipeCursorPagination()
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view)
+        mode = settings.RECIPE_PAGINATION_COUNT
+        if mode == 'none':
+            return self._paginate_without_count(queryset, request)
+        self.django_paginator_class = (
+            EstimatedCountPaginator if mode == 'estimate' else DjangoPaginator
+        )
+        self.page_without_count = None
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Асинхронный вариант paginate_queryset для асинхронных
+        представлений. Курсорная пагинация обслуживается синхронным
+        представлением, поэтому здесь не поддерживается.
+        """
+        self.cursor_pagination = None
+        self.page_without_count = None
+        mode = settings.RECIPE_PAGINATION_COUNT
+        if mode == 'none':
+            number, page_size = self._get_page_without_count(request)
+            offset = (number - 1) * page_size
+            rows = [
+                obj async for obj in queryset[offset:offset + page_size + 1]]
+            return self._set_page_without_count(
+                request, number, page_size, rows)
+        count = None
+        if mode == 'estimate':
+            count = await sync_to_async(estimate_count)(queryset)
+            if (count is not None
+                    and count < settings.RECIPE_COUNT_ESTIMATE_THRESHOLD):
+                count = None
+        return await apaginate_by_number(self, queryset, request, count)
+
+    def _get_page_without_count(self, request):
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=number, message='Неверный номер страницы.'))
+        return number, self.get_page_size(request)
+
+    def _set_page_without_count(self, request, number, page_size, rows):
+        self.request = request
+        self.page_without_count = (number, len(rows) > page_size)
+        return rows[:page_size]
+
+    def _paginate_without_count(self, queryset, request):
+        number, page_size = self._get_page_without_count(request)
+        offset = (number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        return self._set_page_without_count(request, number, page_size, rows)
+
+    def _get_links_without_count(self):
+        number, has_next = self.page_without_count
+        url = self.request.build_absolute_uri()
+        next_link = (
+            replace_query_param(url, self.page_query_param, number + 1)
+            if has_next else None
+        )
+        if number == 1:
+            previous_link = None
+        elif number == 2:
+            previous_link = remove_query_param(url, self.page_query_param)
+        else:
+            previous_link = replace_query_param(
+                url, self.page_query_param, number - 1)
+        return next_link, previous_link
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        if self.page_without_count is None:
+            return super().get_paginated_response(data)
+        next_link, previous_link = self._get_links_without_count()
+        return Response({
+            'count': None,
+            'next': next_link,
+            'previous': previous_link,
+            'results': data,
+        })
@@ -0,0 +1,193 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('api.profiling')
+
+# Профиль текущего запроса: сериализаторы без контекста запроса тоже
+# записывают в него свое время.
+current_profile = ContextVar('current_profile', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """Обертка execute_wrapper, которая собирает статистику SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(
+            count - 1 for count in self.statements.values() if count > 1)
+
+    def most_repeated(self):
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+class ProfiledSerializerMixin:
+    """
+    Добавляет время to_representation (serializer.data) в профиль
+    запроса без учета SQL-запросов, выполненных во время сериализации.
+    Вложенные сериализаторы не считаются повторно.
+    """
+
+    def to_representation(self, instance):
+        profile = current_profile.get()
+        if profile is None or profile['serializing']:
+            return super().to_representation(instance)
+        recorder = profile['recorder']
+        profile['serializing'] = True
+        sql_start = recorder.duration
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            profile['serializing'] = False
+            profile['serializer'] += max(
+                time.perf_counter() - start
+                - (recorder.duration - sql_start), 0)
+
+
+def get_endpoint(request, view_func):
+    """Имя эндпоинта DRF в виде 'RecipeViewSet.list'."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryProfilingMiddleware:
+    """
+    Считает количество и время SQL-запросов, повторяющиеся запросы
+    (признак N+1), время сериализации (ProfiledSerializerMixin) и время
+    остального Python-кода представления без учета SQL (в основном
+    рендеринг ответа).
+
+    Результат добавляется в заголовок Server-Timing и пишется в логгер
+    api.profiling строкой JSON для команды query_report. Для потоковых
+    ответов запросы считаются до конца чтения тела, а заголовок
+    Server-Timing не добавляется. Если количество
+    запросов превышает бюджет эндпоинта из QUERY_BUDGETS, пишется
+    предупреждение, а при QUERY_BUDGET_STRICT выбрасывается исключение.
+    Включается настройкой QUERY_PROFILING_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._profiling = {
+            'endpoint': None, 'recorder': recorder, 'serializer': 0.0,
+            'serializing': False,
+        }
+        token = current_profile.set(request._profiling)
+        start = time.perf_counter()
+        try:
+            with self.recording(recorder):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        if request._profiling['endpoint'] is None:
+            return response
+        if response.streaming:
+            # Запросы потокового ответа выполняются при чтении его тела,
+            # когда заголовки уже отправлены: Server-Timing не добавляется,
+            # статистика пишется после отправки ответа.
+            response.streaming_content = self.record_stream(
+                response.streaming_content, request, response, recorder,
+                start)
+            return response
+        record = self.get_record(request, response, recorder, start)
+        response['Server-Timing'] = (
+            f'db;dur={record["sql_ms"]};desc="{recorder.count} queries, '
+            f'{recorder.duplicates} duplicates", '
+            f'serializer;dur={record["serializer_ms"]}, '
+            f'app;dur={record["app_ms"]}, '
+            f'total;dur={record["total_ms"]}'
+        )
+        self.report(record, recorder)
+        return response
+
+    @staticmethod
+    def recording(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def record_stream(self, content, request, response, recorder, start):
+        with self.recording(recorder):
+            yield from content
+        self.report(
+            self.get_record(request, response, recorder, start), recorder)
+
+    @staticmethod
+    def get_record(request, response, recorder, start):
+        end = time.perf_counter()
+        view = end - request._profiling.get('view_start', end)
+        serializer = request._profiling['serializer']
+        return {
+            'endpoint': request._profiling['endpoint'],
+            'method': request.method,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'duplicates': recorder.duplicates,
+            'sql_ms': round(recorder.duration * 1000, 3),
+            'serializer_ms': round(serializer * 1000, 3),
+            'app_ms': round(
+                max(view - recorder.duration - serializer, 0) * 1000, 3),
+            'total_ms': round((end - start) * 1000, 3),
+        }
+
+    def report(self, record, recorder):
+        logger.info(json.dumps(record))
+        self.check_budget(record['endpoint'], recorder)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling['endpoint'] = get_endpoint(request, view_func)
+        request._profiling['view_start'] = time.perf_counter()
+
+    @staticmethod
+    def check_budget(endpoint, recorder):
+        budget = settings.QUERY_BUDGETS.get(
+            endpoint, settings.QUERY_BUDGET_DEFAULT)
+        if budget is None or recorder.count <= budget:
+            return
+        statement, repeats = recorder.most_repeated()
+        message = (
+            f'{endpoint}: {recorder.count} SQL-запросов при бюджете '
+            f'{budget}, повторов {recorder.duplicates}. '
+            f'Чаще всего ({repeats} раз): {statement}'
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
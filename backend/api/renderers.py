@@ -0,0 +1,23 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PlainTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            # Ошибки отдаются в JSON, как и в остальном API.
+            response['Content-Type'] = JSONRenderer.media_type
+            return JSONRenderer().render(
+                data, renderer_context=renderer_context)
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return ''.join(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
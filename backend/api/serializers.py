@@ -1,20 +1,27 @@
 import base64
-from io import BytesIO
+import binascii
 
 from django.contrib.auth import get_user_model
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Subscription, Tag)
+from recipes.images import get_thumbnail
+from recipes.models import (CartItem, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from recipes.recipe_ingredient_index import journal as ingredient_journal
+from recipes.search import update_search_vector
 from rest_framework import serializers
 
+from .profiling import ProfiledSerializerMixin
+
 User = get_user_model()
 
 
-class UserSerializer(DjoserUserSerializer):
+class UserSerializer(ProfiledSerializerMixin, DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         current_user = None
         if self.context.get('request'):
             current_user = self.context['request'].user
@@ -33,19 +40,39 @@ class UserSerializer(DjoserUserSerializer):
 
 class SubscriptionSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
+
+    recipes_limit_param = 'recipes_limit'
+    max_recipes_limit = 50
+
+    @classmethod
+    def get_recipes_limit(cls, request):
+        """
+        Проверяет параметр recipes_limit. Отсутствующее или нулевое
+        значение, как и слишком большое, ограничивается max_recipes_limit.
+        """
+        value = request.query_params.get(cls.recipes_limit_param) or 0
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            raise serializers.ValidationError({
+                cls.recipes_limit_param: (
+                    'Значение должно быть неотрицательным целым числом.')
+            })
+        if not limit:
+            return cls.max_recipes_limit
+        return min(limit, cls.max_recipes_limit)
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        number_recipes = int(request.GET.get('recipes_limit', 0))
-        recipes = Recipe.objects.filter(author=obj)
-        if number_recipes:
-            recipes = recipes[:number_recipes]
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            limit = self.get_recipes_limit(self.context['request'])
+            recipes = Recipe.objects.filter(author=obj)[:limit]
         return RecipeListSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def validate(self, data):
         if self.context['request'].user == data.get('author'):
             raise serializers.ValidationError(
@@ -56,10 +83,28 @@ class SubscriptionSerializer(UserSerializer):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count',)
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class ThumbnailField(serializers.ImageField):
+    """
+    Ссылка на уменьшенную копию изображения рецепта. Пока копия
+    не готова, возвращается ссылка на исходное изображение.
+    """
+
+    def __init__(self, size, **kwargs):
+        self.size = size
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return get_thumbnail(instance, self.size)
+
+
+class RecipeListSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
+    image_thumb = ThumbnailField('thumb')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_thumb', 'cooking_time',)
         read_only_fields = ('name', 'text',
                             'author', 'image',
                             'cooking_time', 'tags',
@@ -67,13 +112,15 @@ class RecipeListSerializer(serializers.ModelSerializer):
                             )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit',)
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(ProfiledSerializerMixin,
+                                 serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
@@ -86,31 +133,44 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class ImageSerializer(serializers.ImageField):
+    # Длина кратна 4, чтобы каждый фрагмент декодировался отдельно.
+    chunk_size = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
             name = self.context["request"].user.username
-            decoded_image = base64.b64decode(imgstr)
-            file = BytesIO(decoded_image)
-            data = InMemoryUploadedFile(
-                file,
-                field_name='image',
+            data = TemporaryUploadedFile(
                 name=f'{name}.' + ext,
                 content_type='image/' + ext,
-                size=len(decoded_image),
-                charset=None
+                size=0,
+                charset=None,
             )
+            # Изображение декодируется по частям сразу во временный
+            # файл, а не целиком в память.
+            try:
+                for start in range(0, len(imgstr), self.chunk_size):
+                    data.write(base64.b64decode(
+                        imgstr[start:start + self.chunk_size],
+                        validate=True,
+                    ))
+            except binascii.Error:
+                data.close()
+                self.fail('invalid_image')
+            data.size = data.tell()
+            data.seek(0)
         return super().to_internal_value(data)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledSerializerMixin,
+                       serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     author = UserSerializer(read_only=True)
@@ -121,21 +181,29 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True,
     )
     image = ImageSerializer(use_url=True)
+    image_thumb = ThumbnailField('thumb')
+    image_detail = ThumbnailField('detail')
 
     def __create_recipe_ingredient_objects(self, recipe, ingredients):
         obj = (RecipeIngredient(
             recipe=recipe, ingredient_id=ing['id'], amount=ing['amount']
         ) for ing in ingredients)
         RecipeIngredient.objects.bulk_create(obj)
+        update_search_vector([recipe.pk])
+        ingredient_journal.mark([recipe.pk])
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
-        return ShoppingCart.objects.filter(
+        return CartItem.objects.filter(
             recipe=obj, user=current_user).exists()
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
@@ -143,10 +211,13 @@ class RecipeSerializer(serializers.ModelSerializer):
             recipe=obj, user=current_user).exists()
 
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).all().delete()
-        self.__create_recipe_ingredient_objects(instance, ingredients)
-        tags = validated_data.pop('tags', None)
+        # Как и в create, ингредиенты и теги берутся из initial_data:
+        # в validated_data этих полей нет, они только для чтения.
+        ingredients = self.initial_data.get('ingredients')
+        if ingredients is not None:
+            RecipeIngredient.objects.filter(recipe=instance).all().delete()
+            self.__create_recipe_ingredient_objects(instance, ingredients)
+        tags = self.initial_data.get('tags')
         if tags:
             instance.tags.set(tags)
         for attr, value in validated_data.items():
@@ -182,16 +253,81 @@ class RecipeSerializer(serializers.ModelSerializer):
                 'В названии рецепта должна быть хотя бы одна буква.')
         return name
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл перемещается в хранилище, закрываем его явно,
+            # чтобы он не пытался удалить себя при сборке мусора.
+            image = self.validated_data.get('image')
+            if isinstance(image, TemporaryUploadedFile):
+                image.close()
+
     def create(self, validated_data):
         tags = self.initial_data.get('tags')
         ingredients = self.initial_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
+        # bulk_create не отправляет сигналы, поэтому теги сохраняются
+        # последними: m2m_changed сбрасывает кэш уже полного рецепта.
         self.__create_recipe_ingredient_objects(recipe, ingredients)
+        recipe.tags.set(tags)
         return recipe
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_thumb',
+                  'image_detail', 'text', 'cooking_time')
+
+
+class RecipeMatchSerializer(RecipeSerializer):
+    """Рецепт с долей имеющихся ингредиентов и числом недостающих."""
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('coverage', 'missing',)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    max_recipes = 100
+
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=max_recipes, default=list)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=max_recipes, default=list)
+
+    def validate(self, data):
+        data = {key: sorted(set(value)) for key, value in data.items()}
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError(
+                'Рецепт нельзя одновременно добавить и удалить.')
+        return data
+
+
+class RecipeListsBulkSerializer(serializers.Serializer):
+    """
+    Изменения избранного и корзины одним запросом:
+    {"favorite": {"add": [1, 2], "remove": [3]},
+     "shopping_cart": {"add": [4]}}.
+    """
+    favorite = RecipeIdsSerializer(required=False)
+    shopping_cart = RecipeIdsSerializer(required=False)
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError(
+                'Укажите изменения избранного или списка покупок.')
+        added = {
+            recipe_id for changes in data.values()
+            for recipe_id in changes['add']
+        }
+        missing = added and added - set(Recipe.objects.filter(
+            pk__in=added).order_by().values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                'Рецепты не найдены: '
+                f'{", ".join(map(str, sorted(missing)))}.')
+        return data
@@ -0,0 +1,304 @@
+import io
+import json
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (CartItem, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipeQueriesTest(TestCase):
+    """
+    Количество SQL-запросов списка и страницы рецепта не зависит
+    от числа рецептов на странице и ингредиентов в рецепте.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестов', password='pass12345')
+        authors = User.objects.bulk_create(
+            User(email=f'author{number}@example.com',
+                 username=f'author{number}', first_name='Автор',
+                 last_name=str(number))
+            for number in range(5))
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag{number}',
+                color=f'#00000{number}')
+            for number in range(3))
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10))
+        recipes = Recipe.objects.bulk_create(
+            Recipe(name=f'Рецепт {number}', text='Описание',
+                   author=authors[number % len(authors)], cooking_time=10,
+                   image=f'images/recipe{number}.jpg')
+            for number in range(110))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags[:2])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients[:5])
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2])
+        CartItem.objects.bulk_create(
+            CartItem(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3])
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=cls.user, author=author)
+            for author in authors[:2])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        response, small_page = self.count_queries('/api/recipes/?limit=6')
+        self.assertEqual(len(response.data['results']), 6)
+        response, large_page = self.count_queries('/api/recipes/?limit=100')
+        results = response.data['results']
+        self.assertEqual(len(results), 100)
+        self.assertEqual(small_page, large_page)
+        self.assertTrue(any(recipe['is_favorited'] for recipe in results))
+        self.assertTrue(
+            any(recipe['is_in_shopping_cart'] for recipe in results))
+        self.assertTrue(
+            any(recipe['author']['is_subscribed'] for recipe in results))
+
+    def test_list_query_budget(self):
+        # Количество, рецепты, авторы с подписками, теги, ингредиенты.
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/?limit=10')
+        recipe = response.data['results'][0]
+        self.assertEqual(len(recipe['ingredients']), 5)
+        self.assertEqual(recipe['ingredients'][0]['measurement_unit'], 'г')
+
+    @override_settings(QUERY_PROFILING_ENABLED=True)
+    def test_serializer_time_is_profiled(self):
+        with self.assertLogs('api.profiling', 'INFO') as logs:
+            response = self.client.get('/api/recipes/?limit=50')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['endpoint'], 'RecipeViewSet.list')
+        self.assertGreater(record['serializer_ms'], 0)
+        self.assertIn(
+            f'serializer;dur={record["serializer_ms"]}',
+            response['Server-Timing'])
+
+    def test_detail_query_budget(self):
+        recipe = Recipe.objects.first()
+        # Рецепт, автор с подпиской, теги, ингредиенты.
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 5)
+
+
+class ShoppingCartDownloadTest(TestCase):
+    url = '/api/recipes/download_shopping_cart/'
+
+    def test_errors_are_rendered_as_json(self):
+        for url in (self.url, f'{self.url}?format=csv'):
+            with self.subTest(url=url):
+                response = APIClient().get(url)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(
+                    response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+    def test_shopping_list_is_plain_text(self):
+        user = User.objects.create_user(
+            email='cook@example.com', username='cook', password='pass12345')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8')
+
+    @override_settings(QUERY_PROFILING_ENABLED=True)
+    def test_streamed_queries_are_profiled(self):
+        user = User.objects.create_user(
+            email='cook@example.com', username='cook', password='pass12345')
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.assertLogs('api.profiling', 'INFO') as logs:
+            response = client.get(self.url)
+            # Список строится при чтении тела ответа.
+            self.assertEqual(logs.output, [])
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            record['endpoint'], 'RecipeViewSet.download_shopping_cart')
+        self.assertEqual(record['queries'], 1)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=True)
+class RecipeResponseCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='chef@example.com', username='chef', first_name='Повар',
+            last_name='Тестов', password='pass12345')
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            name='Суп', text='Описание', author=cls.author, cooking_time=10,
+            image='images/soup.jpg')
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def assert_refreshed(self, change):
+        for url in (self.url, '/api/recipes/'):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        responses = [self.client.get(url)
+                     for url in (self.url, '/api/recipes/')]
+        for response in responses:
+            self.assertEqual(response['X-Cache'], 'MISS')
+        return responses[0].data
+
+    def test_ingredient_rename(self):
+        self.ingredient.name = 'Морская соль'
+        data = self.assert_refreshed(self.ingredient.save)
+        self.assertEqual(data['ingredients'][0]['name'], 'Морская соль')
+
+    def test_author_change(self):
+        self.author.first_name = 'Шеф'
+        data = self.assert_refreshed(self.author.save)
+        self.assertEqual(data['author']['first_name'], 'Шеф')
+
+    def test_ingredients_loaded_by_command(self):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.json', encoding='utf-8') as file:
+            json.dump([{'name': 'Перец', 'measurement_unit': 'г'}], file)
+            file.flush()
+            self.assert_refreshed(lambda: call_command(
+                'load_data', path=file.name, skip_tags=True,
+                stdout=io.StringIO()))
+
+
+class RecipeListsTest(TestCase):
+    """Избранное, список покупок и подписки через API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@example.com', username='cook', password='pass12345')
+        cls.author = User.objects.create_user(
+            email='chef@example.com', username='chef', password='pass12345')
+        cls.recipe_ids = [
+            recipe.pk for recipe in Recipe.objects.bulk_create(
+                Recipe(name=f'Рецепт {number}', text='Описание',
+                       author=cls.author, cooking_time=10,
+                       image='images/recipe.jpg')
+                for number in range(3))
+        ]
+        Favorite.objects.create(user=cls.user, recipe_id=cls.recipe_ids[2])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def favorites(self):
+        return set(Favorite.objects.filter(user=self.user).values_list(
+            'recipe_id', flat=True))
+
+    def post_bulk(self, data):
+        return self.client.post('/api/recipes/bulk/', data, format='json')
+
+    def test_bulk_returns_changed_ids(self):
+        first, second, third = self.recipe_ids
+        response = self.post_bulk({
+            'favorite': {'add': [second, first, first], 'remove': [third]},
+            'shopping_cart': {'add': [first], 'remove': [second]},
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(response.data['favorite']['added']), [first, second])
+        self.assertEqual(response.data['favorite']['removed'], [third])
+        self.assertEqual(response.data['shopping_cart']['added'], [first])
+        self.assertEqual(response.data['shopping_cart']['removed'], [])
+        self.assertEqual(self.favorites(), {first, second})
+
+    def test_bulk_rejects_invalid_changes_before_writing(self):
+        first, _, third = self.recipe_ids
+        # Повторы считаются до устранения дубликатов.
+        too_many = [first] * 101
+        for data in (
+            {},
+            {'favorite': {'add': [first], 'remove': [first]}},
+            {'favorite': {'add': too_many}},
+            {'favorite': {'add': [first, 10 ** 9], 'remove': [third]}},
+            {'favorite': {'remove': [third]},
+             'shopping_cart': {'add': [10 ** 9]}},
+        ):
+            with self.subTest(data=data):
+                response = self.post_bulk(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.favorites(), {third})
+
+    def test_bulk_is_one_transaction(self):
+        first, _, third = self.recipe_ids
+        with mock.patch(
+                'api.views.remove_recipes',
+                side_effect=[[third], RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                self.post_bulk({
+                    'favorite': {'add': [first], 'remove': [third]},
+                    'shopping_cart': {'remove': [first]},
+                })
+        self.assertEqual(self.favorites(), {third})
+
+    def test_favorite_errors(self):
+        first, second, _ = self.recipe_ids
+        url = f'/api/recipes/{first}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        missing = f'/api/recipes/{10 ** 9}/favorite/'
+        self.assertEqual(self.client.post(missing).status_code, 404)
+        self.assertEqual(self.client.delete(missing).status_code, 404)
+        self.assertEqual(
+            self.client.delete(
+                f'/api/recipes/{second}/shopping_cart/').status_code,
+            400)
+
+    def test_subscription_errors(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        self.assertEqual(
+            self.client.post(
+                f'/api/users/{self.user.pk}/subscribe/').status_code,
+            400)
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        missing = f'/api/users/{10 ** 9}/subscribe/'
+        self.assertEqual(self.client.post(missing).status_code, 404)
+        self.assertEqual(self.client.delete(missing).status_code, 404)
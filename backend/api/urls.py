@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 app_name = 'api'
@@ -17,3 +19,24 @@ urlpatterns = [
     path(r'', include('djoser.urls')),
     path(r'auth/', include('djoser.urls.authtoken'))
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Асинхронные представления перехватывают маршруты роутера,
+    # остальные запросы они передают его синхронным представлениям.
+    sync_views = {url.name: url.callback for url in router.urls}
+    urlpatterns = [
+        path(route, async_views.as_view(handler, sync_views[name]),
+             name=name)
+        for route, handler, name in (
+            ('recipes/', async_views.recipe_list, 'recipe-list'),
+            ('recipes/<int:pk>/', async_views.recipe_detail,
+             'recipe-detail'),
+            ('tags/', async_views.tag_list, 'tag-list'),
+            ('tags/<int:pk>/', async_views.tag_detail, 'tag-detail'),
+            ('ingredients/', async_views.ingredient_list, 'ingredient-list'),
+            ('ingredients/<int:pk>/', async_views.ingredient_detail,
+             'ingredient-detail'),
+            ('users/subscriptions/', async_views.subscriptions,
+             'customuser-subscriptions'),
+        )
+    ] + urlpatterns
@@ -1,10 +1,15 @@
-from typing import Any, Dict, Tuple, Type
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, Tuple, Type
 
 from api.serializers import RecipeListSerializer
 from django.db import models
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
 from django.http import HttpRequest
 from django.shortcuts import get_object_or_404
-from recipes.models import Recipe
+from recipes.models import CartItem, Recipe, RecipeIngredient
+from recipes.toggles import add_recipes, remove_recipes
 from rest_framework import status
 
 
@@ -16,48 +21,118 @@ def modify_obj(
 ) -> Tuple[Dict[str, Any], int]:
     """
     Функция для RecipeViewSet.
-    Создает или удаляет связь между рецептом и пользователем через модель.
+    Добавляет рецепт в избранное или корзину пользователя (model) либо
+    удаляет его оттуда одним запросом, см. recipes.toggles. Повторный
+    запрос возвращает 400, а не ошибку базы данных.
 
     """
-    recipe = get_object_or_404(Recipe, pk=pk)
-    try:
-        if create:
-            model.objects.create(recipe=recipe, user=request.user)
-            serializer = RecipeListSerializer(
-                recipe,
-                context={'request': request}
-            )
-            return serializer.data, status.HTTP_201_CREATED
-        else:
-            model.objects.get(recipe=recipe, user=request.user).delete()
+    if create:
+        recipe = get_object_or_404(Recipe, pk=pk)
+        if not add_recipes(model, request.user, [recipe.pk]):
             return (
-                {"success": f"Рецепт с id {pk} удален."},
-                status.HTTP_204_NO_CONTENT,
+                {"errors": f"Рецепт с id {pk} уже добавлен."},
+                status.HTTP_400_BAD_REQUEST,
             )
-    except models.ObjectDoesNotExist:
+        serializer = RecipeListSerializer(
+            recipe,
+            context={'request': request}
+        )
+        return serializer.data, status.HTTP_201_CREATED
+    if remove_recipes(model, request.user, [pk]):
         return (
-            {"errors": f"У вас нет рецепта с id {pk}."},
-            status.HTTP_400_BAD_REQUEST,
+            {"success": f"Рецепт с id {pk} удален."},
+            status.HTTP_204_NO_CONTENT,
         )
+    # Отличает отсутствующий рецепт от рецепта не из списка пользователя.
+    get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+    return (
+        {"errors": f"У вас нет рецепта с id {pk}."},
+        status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def get_recipes_previews(
+        author_ids: Iterable[int],
+        limit: int,
+) -> Dict[int, list]:
+    """
+    Возвращает не более limit последних рецептов каждого автора
+    одним запросом с ROW_NUMBER() OVER (PARTITION BY author_id).
+    """
+    previews = {author_id: [] for author_id in author_ids}
+    if not previews:
+        return previews
+    ranked = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id', 'name', 'image', 'image_thumb', 'cooking_time', 'author_id'
+    ).annotate(row_number=Window(
+        RowNumber(),
+        partition_by=F('author_id'),
+        order_by=F('id').desc(),
+    )).order_by()
+    sql, params = ranked.query.sql_with_params()
+    for recipe in Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE ranked.row_number <= %s '
+            'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit)):
+        previews[recipe.author_id].append(recipe)
+    return previews
 
 
-def create_shopping_list(queryset):
+def get_shopping_list_ingredients(user) -> Iterable[Dict[str, Any]]:
     """
-    Эта функция создает список покупок на основе переданного QuerySet.
-    Каждый элемент списка имеет следующий формат:
-    'Название ингредиента (единицы): количество'.
+    Возвращает ингредиенты из корзины пользователя,
+    сгруппированные и просуммированные одним SQL-запросом.
     """
-    data = {}
+    return RecipeIngredient.objects.filter(
+        recipe__in=CartItem.objects.filter(user=user).values('recipe')
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
 
-    for ingr in queryset:
-        key = f'{ingr.ingredient.name} ({ingr.ingredient.measurement_unit})'
-        data.setdefault(key, 0)
-        data[key] += ingr.amount
+class _Echo:
+    """Буфер для csv.writer, который возвращает строку вместо записи."""
 
-    shopping_list = ['Список покупок:\n']
+    def write(self, value):
+        return value
 
-    for key, value in data.items():
-        item = f'- {key}: {value} \n'
-        shopping_list.append(item)
 
-    return shopping_list
+def create_shopping_list(
+        ingredients: Iterable[Dict[str, Any]],
+        file_format: str = 'txt',
+) -> Iterator[str]:
+    """
+    Эта функция построчно создает список покупок на основе
+    агрегированных ингредиентов из get_shopping_list_ingredients.
+    Формат txt: '- Название ингредиента (единицы): количество'.
+    """
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in ingredients:
+            yield writer.writerow((
+                item['ingredient__name'],
+                item['ingredient__measurement_unit'],
+                item['total_amount'],
+            ))
+    elif file_format == 'json':
+        yield '['
+        separator = ''
+        for item in ingredients:
+            yield separator + json.dumps({
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['total_amount'],
+            }, ensure_ascii=False)
+            separator = ', '
+        yield ']'
+    else:
+        yield 'Список покупок:\n\n'
+        for item in ingredients:
+            yield (
+                f'- {item["ingredient__name"]} '
+                f'({item["ingredient__measurement_unit"]}): '
+                f'{item["total_amount"]}\n'
+            )
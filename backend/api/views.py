@@ -1,27 +1,77 @@
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
-                            Subscription, Tag)
-from rest_framework import filters, status, viewsets
+from recipes.feed import feed_queryset
+from recipes.models import (CartItem, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from recipes.recipe_ingredient_index import recipe_ingredient_index
+from recipes.recommendations import recommend
+from recipes.toggles import (add_recipes, add_subscription, remove_recipes,
+                             remove_subscription)
+from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from .filters import RecipeFilter
+from .filters import IngredientSearchFilter, RecipeFilter
+from .mixins import (AnonymousResponseCacheMixin, CatalogCacheMixin,
+                     ReplicaReadMixin)
+from .pagination import RecipePagination
 from .permissions import OwnerOrReadOnly, ReadOnly
-from .serializers import (IngredientSerializer, RecipeSerializer,
+from .renderers import CSVRenderer, PlainTextRenderer
+from .serializers import (IngredientSerializer, RecipeListsBulkSerializer,
+                          RecipeMatchSerializer, RecipeSerializer,
                           SubscriptionSerializer, TagSerializer)
-from .utils import modify_obj
+from .utils import (create_shopping_list, get_recipes_previews,
+                    get_shopping_list_ingredients, modify_obj)
 
 User = get_user_model()
 
 
-class ReadOnlyViewSetBase(viewsets.ReadOnlyModelViewSet):
+def annotate_is_subscribed(queryset, user):
+    """Аннотирует пользователей флагом подписки текущего пользователя."""
+    if user.is_anonymous:
+        return queryset.annotate(is_subscribed=Value(False))
+    return queryset.annotate(is_subscribed=Exists(Subscription.objects.filter(
+        author=OuterRef('pk'), subscriber=user)))
+
+
+def annotate_recipes(queryset, user):
+    """
+    Подготавливает рецепты для RecipeSerializer: флаги пользователя
+    и связанные объекты загружаются фиксированным числом запросов.
+    """
+    # Поисковый вектор нужен только в условиях запроса.
+    return queryset.defer('search_vector').with_user_flags(
+        user
+    ).prefetch_related(
+        Prefetch(
+            'author',
+            queryset=annotate_is_subscribed(User.objects.all(), user),
+        ),
+        'tags',
+        Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    )
+
+
+def subscribed_authors(user):
+    return User.objects.filter(
+        subscription__subscriber=user
+    ).annotate(is_subscribed=Value(True)).order_by('id')
+
+
+class ReadOnlyViewSetBase(ReplicaReadMixin, CatalogCacheMixin,
+                          viewsets.ReadOnlyModelViewSet):
     permission_classes = (ReadOnly,)
     pagination_class = None
     http_method_names = ['get']
@@ -35,105 +85,214 @@ class TagViewSet(ReadOnlyViewSetBase):
 class IngredientViewSet(ReadOnlyViewSetBase):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = (r'^name',)
+    filter_backends = (IngredientSearchFilter,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags',
-        'ingredients'
-    ).all()
+class RecipeViewSet(ReplicaReadMixin, AnonymousResponseCacheMixin,
+                    viewsets.ModelViewSet):
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,
                           OwnerOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
+    match_ingredients_param = 'ingredients'
+    match_limit_param = 'limit'
+    match_default_limit = 20
+    match_max_limit = 100
+    match_max_ingredients = 200
+    recommended_default_limit = 20
+    recommended_max_limit = 50
+    bulk_lists = {'favorite': Favorite, 'shopping_cart': CartItem}
+
+    def get_match_params(self, request):
+        """
+        Ингредиенты передаются через запятую или повторением параметра:
+        ?ingredients=1,2&ingredients=3.
+        """
+        values = request.query_params.getlist(self.match_ingredients_param)
+        try:
+            ingredient_ids = {
+                int(value)
+                for item in values for value in item.split(',') if value
+            }
+        except ValueError:
+            ingredient_ids = None
+        if not ingredient_ids:
+            raise serializers.ValidationError({
+                self.match_ingredients_param: (
+                    'Укажите идентификаторы ингредиентов через запятую.')
+            })
+        if len(ingredient_ids) > self.match_max_ingredients:
+            raise serializers.ValidationError({
+                self.match_ingredients_param: (
+                    'Можно указать не более '
+                    f'{self.match_max_ingredients} ингредиентов.')
+            })
+        try:
+            limit = int(request.query_params[self.match_limit_param])
+        except (KeyError, ValueError):
+            limit = self.match_default_limit
+        return ingredient_ids, min(max(limit, 1), self.match_max_limit)
+
+    def get_queryset(self):
+        return annotate_recipes(Recipe.objects.all(), self.request.user)
 
     @action(methods=['post', 'delete'], detail=True,
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk):
-        if request.method == "POST":
-            data, status = modify_obj(request, pk, Favorite, create=True)
-            return Response(data, status=status)
-        data, status = modify_obj(request, pk, Favorite, create=False)
+        create = request.method == 'POST'
+        data, status = modify_obj(request, pk, Favorite, create=create)
         return Response(data, status=status)
 
     @action(methods=['post', 'delete'], detail=True,
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
-        recipe = self.get_object()
-        cart, created = ShoppingCart.objects.get_or_create(
-            user=request.user,
-        )
-        if request.method == 'POST':
-            cart.recipe.add(recipe)
-        else:
-            cart = get_object_or_404(ShoppingCart, recipe=recipe)
-            cart.recipe.remove(recipe)
-        serializer = RecipeSerializer(recipe)
+        create = request.method == 'POST'
+        data, status = modify_obj(request, pk, CartItem, create=create)
+        return Response(data, status=status)
+
+    @action(methods=['post'], detail=False,
+            permission_classes=[IsAuthenticated],
+            serializer_class=RecipeListsBulkSerializer)
+    def bulk(self, request):
+        """
+        Добавляет и удаляет рецепты в избранном и списке покупок одной
+        транзакцией. Возвращает id фактически добавленных и удаленных.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = {}
+        with transaction.atomic():
+            for name, changes in serializer.validated_data.items():
+                model = self.bulk_lists[name]
+                result[name] = {
+                    'added': add_recipes(
+                        model, request.user, changes['add']),
+                    'removed': remove_recipes(
+                        model, request.user, changes['remove']),
+                }
+        return Response(result)
+
+    @action(methods=['get'], detail=False, pagination_class=None,
+            serializer_class=RecipeMatchSerializer)
+    def by_ingredients(self, request):
+        """
+        Рецепты, которые можно приготовить из указанных ингредиентов:
+        по убыванию доли имеющихся ингредиентов рецепта (coverage),
+        затем по числу недостающих (missing).
+        """
+        ingredient_ids, limit = self.get_match_params(request)
+        matches = recipe_ingredient_index.match(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches])
+        result = []
+        for recipe_id, matched, total in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(matched / total, 4)
+            recipe.missing = total - matched
+            result.append(recipe)
+        serializer = self.get_serializer(result, many=True)
         return Response(serializer.data)
 
-    @action(methods=['get'], detail=False,
+    @action(methods=['get'], detail=False, pagination_class=None,
             permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        """
+        Рекомендации: рецепты, похожие на избранные пользователем,
+        и новые рецепты авторов из его подписок.
+        """
+        try:
+            limit = int(request.query_params[self.match_limit_param])
+        except (KeyError, ValueError):
+            limit = self.recommended_default_limit
+        limit = min(max(limit, 1), self.recommended_max_limit)
+        recipe_ids = recommend(request.user, limit)
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True)
+        return Response(serializer.data)
+
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer])
     def download_shopping_cart(self, request):
-        cart = get_object_or_404(ShoppingCart, user=request.user)
-        shopping_list = cart.create_shopping_list()
-        shopping_list_text = '\n'.join(shopping_list)
-        response = HttpResponse(shopping_list_text, content_type='text/plain')
+        renderer = request.accepted_renderer
+        ingredients = get_shopping_list_ingredients(request.user)
+        response = StreamingHttpResponse(
+            create_shopping_list(ingredients.iterator(), renderer.format),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"')
+            f'attachment; filename="shopping_list.{renderer.format}"')
         return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(ReplicaReadMixin, UserViewSet):
     serializer_class = SubscriptionSerializer
     pagination_class = PageNumberPagination
     permission_classes = (IsAuthenticated,)
-    http_method_names = ['get', 'post']
+    http_method_names = ['get', 'post', 'delete']
+    replica_actions = ('subscriptions',)
 
     @action(methods=['get'], detail=False,
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        authors = User.objects.filter(subscription__subscriber=request.user)
+        recipes_limit = SubscriptionSerializer.get_recipes_limit(request)
+        authors = subscribed_authors(request.user)
         page = self.paginate_queryset(authors)
-        if page is not None:
-            serializer = self.get_serializer(
-                page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
+        if page is None:
+            page = list(authors)
+        previews = get_recipes_previews(
+            [author.pk for author in page], recipes_limit)
+        for author in page:
+            author.recipes_preview = previews[author.pk]
         serializer = self.get_serializer(
-            authors, many=True, context={'request': request})
-        return Response(serializer.data)
+            page, many=True, context={'request': request})
+        if self.paginator is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=False, pagination_class=RecipePagination,
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        recipes = annotate_recipes(
+            feed_queryset(request.user), request.user).order_by('-id')
+        page = self.paginate_queryset(recipes)
+        serializer = RecipeSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
     @action(methods=['post'], detail=True,
             permission_classes=[IsAuthenticated])
     def subscribe(self, request, id):
         author = get_object_or_404(User, pk=id)
-        _, created = Subscription.objects.get_or_create(
-            author=author, subscriber=request.user)
-        if not created:
+        if author == request.user:
+            return Response(
+                {"errors": "Нельзя подписаться на самого себя."},
+                status=status.HTTP_400_BAD_REQUEST)
+        if not add_subscription(request.user, author.pk):
             return Response(
                 {"errors": "Вы уже подписаны на этого автора."},
                 status=status.HTTP_400_BAD_REQUEST)
+        author.is_subscribed = True
         serializer = self.get_serializer(
             author, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id):
-        author = get_object_or_404(
-            User,
-            pk=id,
-        )
-        subscription = get_object_or_404(
-            Subscription,
-            author=author,
-            subscriber=request.user,
-        )
-        subscription.delete()
+        if not remove_subscription(request.user, id):
+            get_object_or_404(User.objects.only('pk'), pk=id)
+            return Response(
+                {"errors": "Вы не подписаны на этого автора."},
+                status=status.HTTP_400_BAD_REQUEST)
         return Response({"success": "Вы успешно отписаны."},
                         status=status.HTTP_204_NO_CONTENT)
@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 from .rest_djoser_settings import DJOSER_SETTINGS, REST_FRAMEWORK_SETTINGS
@@ -15,7 +16,7 @@ SECRET_KEY = os.getenv(
     default='django-insecure-f0khymh@$)vk6vb17sdsaf2%%73677sdajjdfbj&'
 )
 
-DEBUG = os.getenv('DEBUG', default=True)
+DEBUG = os.getenv('DEBUG', default='True') == 'True'
 
 ALLOWED_HOSTS = os.getenv(
     'ALLOWED_HOSTS',
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +78,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend_foodgram.wsgi.application'
 
+# Асинхронные представления чтения рецептов, справочников и подписок
+# (api/async_views.py) для запуска под ASGI-сервером. Каждый процесс
+# одновременно держит не больше ASYNC_DB_CONNECTIONS соединений с БД.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='False') == 'True'
+ASYNC_DB_CONNECTIONS = int(os.getenv('ASYNC_DB_CONNECTIONS', default=10))
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
@@ -83,10 +91,71 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default=''),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        # Время жизни соединения в секундах (0 - новое соединение на каждый
+        # запрос) и проверка соединения перед повторным использованием.
+        # Под ASGI соединения создаются в отдельном потоке для каждого
+        # запроса, поэтому постоянные соединения там отключены.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=0 if ASYNC_READ_VIEWS else 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+        # PgBouncer в режиме transaction не поддерживает серверные курсоры,
+        # которые использует QuerySet.iterator().
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_POOLER', default='False') == 'True',
+        # Для SQLite тестовая БД по умолчанию создается в памяти и не
+        # поддерживает одновременную запись из нескольких потоков.
+        'TEST': {'NAME': os.getenv('DB_TEST_NAME')},
     }
 }
 
+# Реплика для чтения (recipes.db_router). Задается хостом или, например
+# для проверки на двух файлах SQLite, именем БД; остальные параметры
+# совпадают с основной БД.
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST', default=DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'NAME': os.getenv('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['recipes.db_router.ReplicaRouter']
+
+# Сколько секунд после изменения данных чтение идет с основной БД:
+# для пользователя после его изменяющего запроса, для справочников
+# и кэшируемых ответов - после изменения модели. Должно превышать
+# обычную задержку репликации.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=5))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Версии данных (recipes.versioning) и закрепление за основной БД хранятся
+# в кэше и должны быть общими для всех воркеров и management-команд:
+# с кэшем в памяти процесса изменения, сделанные в одном процессе, не
+# сбрасывают кэш ответов и индексы в остальных. Такой кэш допустим только
+# при отладке и в тестах.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+if not DEBUG and CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+    raise ImproperlyConfigured(
+        'При DEBUG=False нужен общий для процессов кэш: задайте '
+        'CACHE_BACKEND и CACHE_LOCATION, например Redis.'
+    )
+# Закрепление пользователя за основной БД после записи тоже хранится
+# в кэше: запрос к другому воркеру должен его видеть.
+if 'replica' in DATABASES and CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+    raise ImproperlyConfigured(
+        'Реплика для чтения требует общего для процессов кэша: задайте '
+        'CACHE_BACKEND и CACHE_LOCATION.'
+    )
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -122,4 +191,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 REST_FRAMEWORK = REST_FRAMEWORK_SETTINGS
 
+INGREDIENT_INDEX_ENABLED = os.getenv('INGREDIENT_INDEX_ENABLED', default='True') == 'True'
+
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', default=300))
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', default=3600))
+
+RECIPE_CACHE_ENABLED = os.getenv('RECIPE_CACHE_ENABLED', default='False') == 'True'
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', default=300))
+# Ключи кэша ответов строятся из версий данных: с кэшем в памяти процесса
+# изменения из других воркеров и management-команд не сбрасывают его.
+if RECIPE_CACHE_ENABLED and CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+    raise ImproperlyConfigured(
+        'RECIPE_CACHE_ENABLED требует общего для процессов кэша: задайте '
+        'CACHE_BACKEND и CACHE_LOCATION.'
+    )
+
+# Конфигурация полнотекстового поиска PostgreSQL для языка проекта
+RECIPE_SEARCH_CONFIG = os.getenv(
+    'RECIPE_SEARCH_CONFIG',
+    default={'ru': 'russian', 'en': 'english'}.get(LANGUAGE_CODE.split('-')[0], 'simple'),
+)
+
+# Число похожих рецептов, сохраняемых для каждого рецепта, и число
+# последних избранных рецептов пользователя, по которым строятся рекомендации
+RECOMMENDATION_NEIGHBORS = int(os.getenv('RECOMMENDATION_NEIGHBORS', default=20))
+RECOMMENDATION_SEEDS = int(os.getenv('RECOMMENDATION_SEEDS', default=50))
+
+# Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, не
+# раскладываются по лентам, а выбираются при чтении ленты
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', default=100))
+
+# 'exact', 'estimate' или 'none'
+RECIPE_PAGINATION_COUNT = os.getenv('RECIPE_PAGINATION_COUNT', default='exact')
+RECIPE_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('RECIPE_COUNT_ESTIMATE_THRESHOLD', default=10000))
+
+# Максимальные размеры уменьшенных копий изображений рецептов
+RECIPE_IMAGE_SIZES = {
+    'thumb': (480, 480),
+    'detail': (1200, 1200),
+}
+# 'WEBP' или 'JPEG'
+RECIPE_IMAGE_FORMAT = os.getenv('RECIPE_IMAGE_FORMAT', default='WEBP')
+RECIPE_IMAGE_QUALITY = int(os.getenv('RECIPE_IMAGE_QUALITY', default=80))
+IMAGE_TASK_RUNNER = os.getenv('IMAGE_TASK_RUNNER', default='recipes.images.ThreadPoolRunner')
+IMAGE_TASK_WORKERS = int(os.getenv('IMAGE_TASK_WORKERS', default=2))
+
+QUERY_PROFILING_ENABLED = os.getenv('QUERY_PROFILING_ENABLED', default='False') == 'True'
+QUERY_PROFILING_LOG = os.getenv('QUERY_PROFILING_LOG', default=os.path.join(BASE_DIR, 'query_profile.log'))
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', default='False') == 'True'
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'RecipeViewSet.list': 8,
+    'RecipeViewSet.retrieve': 6,
+    'RecipeViewSet.by_ingredients': 6,
+    'RecipeViewSet.recommended': 9,
+    'RecipeViewSet.download_shopping_cart': 3,
+    'RecipeViewSet.bulk': 12,
+    'TagViewSet.list': 2,
+    'IngredientViewSet.list': 2,
+    'UserViewSet.subscriptions': 6,
+    'UserViewSet.feed': 9,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'query_profile': {
+            'class': 'logging.FileHandler',
+            'filename': QUERY_PROFILING_LOG,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'api.profiling': {
+            'handlers': ['query_profile'],
+            'level': 'INFO',
+        },
+    },
+}
+
 DJOSER = DJOSER_SETTINGS
@@ -0,0 +1,72 @@
+"""
+Сравнение двух отчетов benchmarks.run:
+
+    python -m benchmarks.compare before.json after.json
+
+С --plans выводятся планы запросов эндпоинтов, у которых они изменились
+(отчеты должны быть получены с --explain).
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def change(before, after):
+    if not before:
+        return '    n/a'
+    return f'{(after - before) / before * 100:+6.1f}%'
+
+
+def get_plans(result):
+    return [query['plan'] for query in result.get('query_plans', ())]
+
+
+def print_plans(name, old, new):
+    print(f'\n{name}')
+    for title, plans in (('before', old), ('after', new)):
+        print(f'  {title}:')
+        for number, plan in enumerate(plans, 1):
+            print(f'    [{number}]')
+            for line in plan:
+                print(f'      {line}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--plans', action='store_true',
+                        help='Показать изменившиеся планы запросов.')
+    options = parser.parse_args(argv)
+    before, after = load(options.before), load(options.after)
+    print(f'{before["commit"]} -> {after["commit"]}')
+    for name, result in after['results'].items():
+        old = before['results'].get(name)
+        if old is None:
+            continue
+        old_p50 = old['latency_ms']['p50']
+        new_p50 = result['latency_ms']['p50']
+        print(
+            f'{name:28} '
+            f'p50 {old_p50:8.2f} -> {new_p50:8.2f} ms '
+            f'({change(old_p50, new_p50)})'
+            f'  queries {old["queries_per_request"]["mean"]:6.1f} -> '
+            f'{result["queries_per_request"]["mean"]:6.1f}'
+        )
+    if not options.plans:
+        return
+    for name, result in after['results'].items():
+        old = before['results'].get(name)
+        if old is None:
+            continue
+        old_plans, new_plans = get_plans(old), get_plans(result)
+        if old_plans != new_plans:
+            print_plans(name, old_plans, new_plans)
+
+
+if __name__ == '__main__':
+    main()
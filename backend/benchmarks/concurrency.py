@@ -0,0 +1,258 @@
+"""
+Пропускная способность WSGI- и ASGI-развертывания при конкурентных запросах.
+
+Запуск из каталога backend:
+
+    DB_ENGINE=django.db.backends.sqlite3 python -m benchmarks.concurrency \
+        --workers 2 --concurrency 32 --requests 500 --output concurrency.json
+
+Создается тестовая БД Django с синтетическими данными (для SQLite - файл
+во временном каталоге, чтобы его видели процессы серверов), затем по очереди
+запускаются gunicorn с синхронными воркерами (backend_foodgram.wsgi) и
+gunicorn с воркерами uvicorn (backend_foodgram.asgi, ASYNC_READ_VIEWS=True)
+с одинаковым числом процессов. Каждый эндпоинт опрашивается --concurrency
+клиентами одновременно. Рабочие данные не затрагиваются.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .run import get_commit, percentile
+
+SERVERS = {
+    'wsgi': ('backend_foodgram.wsgi:application',),
+    'asgi': ('backend_foodgram.asgi:application',
+             '--worker-class', 'uvicorn.workers.UvicornWorker'),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--subscriptions', type=int, default=10,
+                        help='Подписок на пользователя.')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Процессов gunicorn для каждого сервера.')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='Одновременных клиентов.')
+    parser.add_argument('--requests', type=int, default=300,
+                        help='Количество запросов к каждому эндпоинту.')
+    parser.add_argument('--db-connections', type=int, default=10,
+                        help='ASYNC_DB_CONNECTIONS для ASGI-сервера.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    return parser.parse_args(argv)
+
+
+def get_scenarios(token, recipe_id):
+    auth = {'Authorization': f'Token {token}'}
+    return (
+        ('recipes_list_anonymous', {}, '/api/recipes/'),
+        ('recipes_list', auth, '/api/recipes/'),
+        ('recipe_detail', auth, f'/api/recipes/{recipe_id}/'),
+        ('tags', {}, '/api/tags/'),
+        ('ingredients_search', {},
+         '/api/ingredients/?name=%D0%B8%D0%BD%D0%B3'),
+        ('subscriptions', auth, '/api/users/subscriptions/?recipes_limit=3'),
+    )
+
+
+class Client(threading.local):
+    """HTTP-соединение с keep-alive, отдельное для каждого потока."""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection(
+            '127.0.0.1', port, timeout=60)
+
+    def get(self, url, headers):
+        start = time.perf_counter()
+        try:
+            self.connection.request('GET', url, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            status = None
+        return status, (time.perf_counter() - start) * 1000
+
+
+def run_scenario(client, url, headers, requests, concurrency):
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(
+            lambda _: client.get(url, headers), range(concurrency)))
+        started = time.perf_counter()
+        results = list(executor.map(
+            lambda _: client.get(url, headers), range(requests)))
+        elapsed = time.perf_counter() - started
+    latencies = [latency for _, latency in results]
+    statuses = [status for status, _ in results]
+    return {
+        'url': url,
+        'statuses': sorted({status for status in statuses if status}),
+        'errors': statuses.count(None),
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughput_rps': round(requests / elapsed, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3),
+        },
+    }
+
+
+def wait_ready(process, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Сервер завершился при запуске.')
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+        try:
+            connection.request('GET', '/api/tags/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+        finally:
+            connection.close()
+    raise RuntimeError('Сервер не ответил за отведенное время.')
+
+
+def benchmark_server(name, options, environment, scenarios, base_dir):
+    command = (
+        sys.executable, '-m', 'gunicorn', *SERVERS[name],
+        '--bind', f'127.0.0.1:{options.port}',
+        '--workers', str(options.workers),
+        '--log-level', 'warning',
+    )
+    environment = dict(
+        environment, ASYNC_READ_VIEWS=str(name == 'asgi'),
+        ASYNC_DB_CONNECTIONS=str(options.db_connections),
+    )
+    process = subprocess.Popen(command, cwd=base_dir, env=environment)
+    try:
+        wait_ready(process, options.port)
+        client = Client(options.port)
+        results = {}
+        for scenario, headers, url in scenarios:
+            results[scenario] = run_scenario(
+                client, url, headers, options.requests, options.concurrency)
+            latency = results[scenario]['latency_ms']
+            print(
+                f'{name} {scenario:24} '
+                f'rps={results[scenario]["throughput_rps"]:8.1f} '
+                f'p50={latency["p50"]:8.2f} ms '
+                f'p99={latency["p99"]:8.2f} ms '
+                f'errors={results[scenario]["errors"]}',
+                file=sys.stderr,
+            )
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'backend_foodgram.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from recipes.models import Recipe
+    from rest_framework.authtoken.models import Token
+
+    directory = tempfile.TemporaryDirectory()
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory.name, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        call_command(
+            'generate_fake_data', users=options.users,
+            recipes=options.recipes, ingredients=options.ingredients,
+            subscriptions=options.subscriptions, seed=options.seed,
+            prefix='bench', stdout=sys.stderr,
+        )
+        user = get_user_model().objects.filter(
+            username__startswith='bench_').order_by('id').first()
+        token, _ = Token.objects.get_or_create(user=user)
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        scenarios = get_scenarios(token.key, recipe_id)
+        connection.close()
+        environment = dict(
+            os.environ, DB_NAME=connection.settings_dict['NAME'],
+            DEBUG='', ALLOWED_HOSTS='127.0.0.1',
+        )
+        # Воркеры сервера должны видеть общие версии данных.
+        environment.setdefault(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache')
+        environment.setdefault(
+            'CACHE_LOCATION', tempfile.mkdtemp(prefix='foodgram-cache-'))
+        # Реплика не содержит тестовых данных.
+        for name in ('DB_REPLICA_HOST', 'DB_REPLICA_NAME'):
+            environment.pop(name, None)
+        results = {
+            name: benchmark_server(
+                name, options, environment, scenarios, settings.BASE_DIR)
+            for name in SERVERS
+        }
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': get_commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'options': {
+                key: getattr(options, key) for key in (
+                    'users', 'recipes', 'ingredients', 'subscriptions',
+                    'workers', 'concurrency', 'requests', 'db_connections',
+                    'seed')
+            },
+            'results': results,
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        directory.cleanup()
+    for scenario, result in results['wsgi'].items():
+        wsgi = result['throughput_rps']
+        asgi = results['asgi'][scenario]['throughput_rps']
+        print(
+            f'{scenario:24} wsgi {wsgi:8.1f} rps  asgi {asgi:8.1f} rps  '
+            f'x{asgi / wsgi:.2f}',
+            file=sys.stderr,
+        )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
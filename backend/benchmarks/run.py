@@ -0,0 +1,246 @@
+"""
+Нагрузочный тест API Foodgram на синтетических данных.
+
+Запуск из каталога backend:
+
+    DB_ENGINE=django.db.backends.sqlite3 python -m benchmarks.run \
+        --recipes 2000 --requests 50 --output bench.json
+
+Используется тестовая БД Django (test_<DB_NAME> для PostgreSQL,
+БД в памяти для SQLite), рабочие данные не затрагиваются.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument('--favorites', type=int, default=20,
+                        help='Избранных рецептов на пользователя.')
+    parser.add_argument('--carts', type=int, default=5,
+                        help='Рецептов в корзине на пользователя.')
+    parser.add_argument('--subscriptions', type=int, default=10,
+                        help='Подписок на пользователя.')
+    parser.add_argument('--requests', type=int, default=30,
+                        help='Количество запросов к каждому эндпоинту.')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--explain', action='store_true',
+                        help='Сохранить планы SELECT-запросов эндпоинтов.')
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    return parser.parse_args(argv)
+
+
+def get_scenarios(user):
+    return (
+        ('recipes_list_anonymous', None, '/api/recipes/'),
+        ('recipes_list', user, '/api/recipes/'),
+        ('recipes_list_page_100', user, '/api/recipes/?limit=100'),
+        ('recipes_list_tags', user,
+         '/api/recipes/?tags=breakfast&tags=dinner'),
+        ('recipes_list_author', None, f'/api/recipes/?author={user.pk}'),
+        ('recipes_list_favorited', user, '/api/recipes/?is_favorited=1'),
+        ('recipes_list_in_cart', user,
+         '/api/recipes/?is_in_shopping_cart=1'),
+        ('recipes_list_deep_page', user, '/api/recipes/?page=50'),
+        ('recipes_list_cursor', user, '/api/recipes/?cursor='),
+        ('recipe_detail', user, '/api/recipes/{recipe_id}/'),
+        ('tags', None, '/api/tags/'),
+        ('ingredients_search', None, '/api/ingredients/?name=ингредиент 1'),
+        ('subscriptions', user, '/api/users/subscriptions/?recipes_limit=3'),
+        ('feed', user, '/api/users/feed/'),
+        ('download_shopping_cart', user,
+         '/api/recipes/download_shopping_cart/'),
+    )
+
+
+def run_scenario(client, url, requests, warmup):
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        client.get(url)
+    latencies, queries, statuses = [], [], set()
+    started = time.perf_counter()
+    for _ in range(requests):
+        # Запросы считаются по всем БД, включая реплику.
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            start = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(sum(
+            len(context.captured_queries) for context in contexts))
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+    return {
+        'url': url,
+        'statuses': sorted(statuses),
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3),
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        },
+    }
+
+
+def explain_queries(client, url):
+    """
+    Планы SELECT-запросов одного обращения к эндпоинту: EXPLAIN QUERY PLAN
+    для SQLite, EXPLAIN для PostgreSQL.
+    """
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    with ExitStack() as stack:
+        contexts = {
+            connection: stack.enter_context(CaptureQueriesContext(connection))
+            for connection in connections.all()
+        }
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    plans = []
+    for connection, context in contexts.items():
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                cursor.execute(f'{prefix} {sql}')
+                # Текст плана - в последнем столбце у обеих СУБД.
+                plans.append({
+                    'sql': sql,
+                    'plan': [row[-1] for row in cursor.fetchall()],
+                })
+    return plans
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ('git', 'rev-parse', 'HEAD'), text=True,
+            stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'backend_foodgram.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection, connections
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+    from recipes.models import Recipe
+    from rest_framework.test import APIClient
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    for alias in connections:
+        if connections[alias].settings_dict['TEST']['MIRROR'] == 'default':
+            connections[alias].creation.set_as_test_mirror(
+                connection.settings_dict)
+    try:
+        started = time.perf_counter()
+        call_command(
+            'generate_fake_data', users=options.users,
+            recipes=options.recipes, ingredients=options.ingredients,
+            ingredients_per_recipe=options.ingredients_per_recipe,
+            favorites=options.favorites, carts=options.carts,
+            subscriptions=options.subscriptions, seed=options.seed,
+            prefix='bench', stdout=sys.stderr,
+        )
+        dataset_seconds = time.perf_counter() - started
+        user = get_user_model().objects.filter(
+            username__startswith='bench_').order_by('id').first()
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+
+        results = {}
+        for name, client_user, url in get_scenarios(user):
+            client = APIClient()
+            if client_user is not None:
+                client.force_authenticate(client_user)
+            results[name] = run_scenario(
+                client, url.format(recipe_id=recipe_id),
+                options.requests, options.warmup)
+            if options.explain:
+                results[name]['query_plans'] = explain_queries(
+                    client, url.format(recipe_id=recipe_id))
+            latency = results[name]['latency_ms']
+            print(
+                f'{name:28} p50={latency["p50"]:8.2f} ms '
+                f'p99={latency["p99"]:8.2f} ms '
+                f'queries={results[name]["queries_per_request"]["mean"]:6.1f} '
+                f'rps={results[name]["throughput_rps"]:8.1f}',
+                file=sys.stderr,
+            )
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': get_commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': platform.platform(),
+                'recipe_cache_enabled': settings.RECIPE_CACHE_ENABLED,
+            },
+            'dataset': {
+                key: getattr(options, key) for key in (
+                    'users', 'recipes', 'ingredients',
+                    'ingredients_per_recipe', 'favorites', 'carts',
+                    'subscriptions', 'seed')
+            },
+            'dataset_seconds': round(dataset_seconds, 3),
+            'results': results,
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
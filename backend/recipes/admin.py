@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .models import (CartItem, Favorite, Ingredient, Recipe,
+                     RecipeIngredient, Tag)
+from .search import update_search_vector
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -17,9 +18,14 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags',)
     inlines = (RecipeIngredientInline,)
 
-    @staticmethod
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Ингредиенты сохраняются после рецепта, вектор пересчитывается
+        # с их новыми названиями.
+        update_search_vector([form.instance.pk])
+
     def added_to_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     added_to_favorites.short_description = 'Добавления в избранное'
 
@@ -43,13 +49,9 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_editable = ('amount',)
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'recipe_list_display')
-
-    def recipe_list_display(self, obj):
-        return ', '.join([recipe.name for recipe in obj.recipe.all()])
-
-    recipe_list_display.short_description = 'Recipes'
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'recipe', 'added_at')
+    list_select_related = ('user', 'recipe')
 
 
 class FavoriteAdmin(admin.ModelAdmin):
@@ -62,7 +64,7 @@ register_models = {
     Ingredient: IngredientAdmin,
     RecipeIngredient: RecipeIngredientAdmin,
     Favorite: FavoriteAdmin,
-    ShoppingCart: ShoppingCartAdmin,
+    CartItem: CartItemAdmin,
 }
 
 for base_model, admin_model in register_models.items():
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import CartItem, Favorite, Recipe, Subscription
+
+User = get_user_model()
+
+COUNTERS = (
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_cart_count', CartItem, 'recipe'),
+)
+
+
+def change_counter(model, pks, field, delta):
+    """
+    Атомарно изменяет счетчик через F()-выражение, без чтения значения.
+    Уменьшение не опускает счетчик ниже нуля.
+    """
+    if not pks or not delta:
+        return
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(source, relation):
+    """Подзапрос с фактическим количеством связанных строк."""
+    return Coalesce(Subquery(
+        source.objects.filter(
+            **{relation: OuterRef('pk')}
+        ).order_by().values(relation).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), Value(0))
+
+
+def recount(dry_run=False):
+    """
+    Сверяет счетчики с фактическими данными и исправляет расхождения.
+    Возвращает количество исправленных строк по каждому счетчику.
+    """
+    fixed = {}
+    for model, field, source, relation in COUNTERS:
+        drifted = model.objects.annotate(
+            actual=actual_count(source, relation)
+        ).exclude(**{field: F('actual')})
+        fixed[f'{model._meta.model_name}.{field}'] = drifted.count()
+        if not dry_run:
+            model.objects.filter(
+                pk__in=drifted.values('pk')
+            ).update(**{field: actual_count(source, relation)})
+    return fixed
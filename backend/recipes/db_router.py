@@ -0,0 +1,90 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .versioning import get_modified
+
+REPLICA_DB_ALIAS = 'replica'
+
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """
+    Чтение выполняется с основной БД, а внутри reads_from(alias) - с
+    указанной БД. Запись и миграции - только на основной БД: реплика
+    получает данные репликацией.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
+
+
+def replica_enabled():
+    return REPLICA_DB_ALIAS in connections.settings
+
+
+@contextmanager
+def reads_from(alias):
+    token = read_database.set(alias)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def primary_reads():
+    return reads_from(None)
+
+
+def _sticky_key(user_id):
+    return f'db:sticky:{user_id}'
+
+
+def stick_to_primary(user):
+    """
+    После изменяющего запроса пользователь REPLICA_STICKY_SECONDS читает
+    с основной БД и видит свои изменения, даже если реплика отстает.
+    """
+    if replica_enabled() and user.is_authenticated:
+        cache.set(
+            _sticky_key(user.pk), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def replica_for(user):
+    """БД для чтения в запросе пользователя: реплика или None (основная)."""
+    if not replica_enabled():
+        return None
+    if user.is_authenticated and cache.get(_sticky_key(user.pk)):
+        return None
+    return REPLICA_DB_ALIAS
+
+
+def is_recent(modified):
+    return (
+        modified is not None
+        and modified > time.time() - settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def recently_modified(*models):
+    """
+    Данные моделей менялись недавно и реплика может их еще не получить.
+    Ответы, которые кэшируются под версией данных, в этом случае нужно
+    строить по основной БД, иначе в кэш под новой версией попадут
+    устаревшие данные.
+    """
+    return any(is_recent(get_modified(model)) for model in models)
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from .models import FeedItem, Recipe, Subscription
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def is_large_author(author_id):
+    """
+    Рецепты авторов с большим числом подписчиков не раскладываются
+    по лентам при публикации, а добавляются к ленте при чтении.
+    """
+    return User.objects.filter(
+        pk=author_id, subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if is_large_author(recipe.author_id):
+        return
+    subscribers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('subscriber_id', flat=True)
+    FeedItem.objects.bulk_create((
+        FeedItem(user_id=subscriber_id, recipe_id=recipe.pk,
+                 author_id=recipe.author_id)
+        for subscriber_id in subscribers.iterator()
+    ), batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill(subscriber_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if is_large_author(author_id):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE]
+    FeedItem.objects.bulk_create((
+        FeedItem(user_id=subscriber_id, recipe_id=recipe_id,
+                 author_id=author_id)
+        for recipe_id in recipes
+    ), batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def prune(subscriber_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedItem.objects.filter(
+        user_id=subscriber_id, author_id=author_id).delete()
+
+
+def feed_queryset(user):
+    """
+    Рецепты ленты пользователя: сохранённые записи ленты и, для крупных
+    авторов из подписок, рецепты, выбираемые при чтении.
+    """
+    large_authors = list(User.objects.filter(
+        subscription__subscriber=user,
+        subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('id', flat=True))
+    if not large_authors:
+        return Recipe.objects.filter(feed_items__user=user)
+    return Recipe.objects.filter(
+        Q(pk__in=FeedItem.objects.filter(user=user).values('recipe_id'))
+        | Q(author_id__in=large_authors)
+    )
+
+
+def rebuild():
+    """
+    Заполняет ленты заново по текущим подпискам, например после
+    массовой загрузки данных или изменения FEED_FANOUT_LIMIT.
+    Возвращает количество созданных записей.
+    """
+    authors = User.objects.filter(
+        subscribers_count__gt=0,
+        subscribers_count__lte=settings.FEED_FANOUT_LIMIT,
+    ).values_list('id', flat=True)
+    created = 0
+    with transaction.atomic():
+        FeedItem.objects.all().delete()
+        for author_id in authors.iterator():
+            recipes = list(Recipe.objects.filter(
+                author_id=author_id
+            ).order_by('-id').values_list('id', flat=True)[
+                :settings.FEED_BACKFILL_SIZE])
+            subscribers = Subscription.objects.filter(
+                author_id=author_id).values_list('subscriber_id', flat=True)
+            items = [
+                FeedItem(user_id=subscriber_id, recipe_id=recipe_id,
+                         author_id=author_id)
+                for subscriber_id in subscribers
+                for recipe_id in recipes
+            ]
+            FeedItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+            created += len(items)
+    return created
@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from .versioning import bump_version
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'images/thumbs/'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def thumbnail_name(image_name, size):
+    """
+    Возвращает имя уменьшенной копии изображения. Имя однозначно
+    определяется исходным файлом и параметрами обработки, поэтому по нему
+    видно, соответствует ли сохранённая копия текущему изображению,
+    а содержимое файла с таким именем никогда не меняется.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    width, height = settings.RECIPE_IMAGE_SIZES[size]
+    quality = settings.RECIPE_IMAGE_QUALITY
+    extension = EXTENSIONS[settings.RECIPE_IMAGE_FORMAT]
+    return (f'{THUMBNAIL_DIR}{stem[:2]}/'
+            f'{stem}_{size}_{width}x{height}q{quality}.{extension}')
+
+
+def get_thumbnail(recipe, size):
+    """
+    Возвращает уменьшенную копию изображения рецепта, а пока она
+    не готова или устарела — исходное изображение.
+    """
+    thumbnail = getattr(recipe, f'image_{size}')
+    if (recipe.image and thumbnail
+            and thumbnail.name == thumbnail_name(recipe.image.name, size)):
+        return thumbnail
+    return recipe.image
+
+
+def thumbnails_outdated(recipe):
+    if not recipe.image:
+        return False
+    return any(
+        getattr(recipe, f'image_{size}').name
+        != thumbnail_name(recipe.image.name, size)
+        for size in settings.RECIPE_IMAGE_SIZES
+    )
+
+
+def render_thumbnail(image, max_size):
+    thumbnail = ImageOps.exif_transpose(image)
+    thumbnail.thumbnail(max_size, Image.LANCZOS)
+    image_format = settings.RECIPE_IMAGE_FORMAT
+    if image_format == 'JPEG' and thumbnail.mode != 'RGB':
+        thumbnail = thumbnail.convert('RGB')
+    elif thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert('RGBA')
+    buffer = BytesIO()
+    thumbnail.save(buffer, image_format,
+                   quality=settings.RECIPE_IMAGE_QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def make_thumbnails(recipe_id):
+    """
+    Создаёт уменьшенные копии изображения рецепта для всех размеров
+    из RECIPE_IMAGE_SIZES. Готовые копии одинаковых изображений
+    используются повторно. Если за время обработки изображение рецепта
+    заменили, результат не сохраняется: задача для нового изображения
+    уже поставлена в очередь.
+    """
+    from .models import Recipe
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', *(f'image_{size}' for size in settings.RECIPE_IMAGE_SIZES)
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+    fields = {
+        f'image_{size}': thumbnail_name(recipe.image.name, size)
+        for size in settings.RECIPE_IMAGE_SIZES
+    }
+    missing = {
+        size: settings.RECIPE_IMAGE_SIZES[size]
+        for size in settings.RECIPE_IMAGE_SIZES
+        if not default_storage.exists(fields[f'image_{size}'])
+    }
+    if missing:
+        with recipe.image.open('rb') as file, Image.open(file) as image:
+            image.load()
+            for size, max_size in missing.items():
+                name = fields[f'image_{size}']
+                saved = default_storage.save(
+                    name, render_thumbnail(image, max_size))
+                if saved != name:
+                    # Копию параллельно создала другая задача.
+                    default_storage.delete(saved)
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name).update(**fields)
+    if updated:
+        bump_version(Recipe)
+        bump_version(Recipe, recipe_id)
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Ошибка обработки изображения: %s%r',
+                         func.__name__, args)
+
+
+def run_task_in_thread(func, *args):
+    # У каждого потока свои соединения с базой: закрываем их сами,
+    # как это делает Django после обработки запроса.
+    close_old_connections()
+    try:
+        run_task(func, *args)
+    finally:
+        connections.close_all()
+
+
+class SyncRunner:
+    """Выполняет задачи сразу, в текущем потоке."""
+
+    def submit(self, func, *args):
+        run_task(func, *args)
+
+
+class ThreadPoolRunner:
+    """
+    Выполняет задачи в пуле потоков внутри процесса. Подходит для
+    разработки и небольших установок; для отдельного воркера достаточно
+    указать в IMAGE_TASK_RUNNER класс с таким же методом submit.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_TASK_WORKERS,
+            thread_name_prefix='images',
+        )
+
+    def submit(self, func, *args):
+        self.executor.submit(run_task_in_thread, func, *args)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = import_string(settings.IMAGE_TASK_RUNNER)()
+    return _runner
+
+
+def schedule_thumbnails(recipe_id):
+    """Ставит создание уменьшенных копий в очередь после коммита."""
+    transaction.on_commit(
+        lambda: get_runner().submit(make_thumbnails, recipe_id))
@@ -0,0 +1,87 @@
+import threading
+from bisect import bisect_left
+
+from django.db.models import Count, Max
+
+from .db_router import primary_reads
+from .models import Ingredient
+from .versioning import get_version
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса для автодополнения.
+    Строится лениво при первом запросе и хранит отсортированный массив
+    названий, поиск по началу строки выполняется через bisect.
+    Актуальность проверяется по версии данных модели Ingredient
+    (см. recipes.versioning), а также по количеству ингредиентов и
+    наибольшему id в БД: так индекс видит загрузку и удаление
+    ингредиентов в другом процессе, даже если версия в кэше не общая.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._keys = []
+        self._items = []
+
+    @staticmethod
+    def get_db_state():
+        with primary_reads():
+            state = Ingredient.objects.aggregate(
+                count=Count('pk'), max_id=Max('pk'))
+        return state['count'], state['max_id']
+
+    def build(self, version=None):
+        if version is None:
+            version = get_version(Ingredient)
+        # Индекс помечается текущей версией, поэтому читается основная БД:
+        # реплика может еще не получить последние изменения.
+        with primary_reads():
+            rows = sorted(
+                (name.casefold(), pk, name, measurement_unit)
+                for pk, name, measurement_unit
+                in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit')
+            )
+        keys = [row[0] for row in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        max_id = max((row[1] for row in rows), default=None)
+        state = (version, len(rows), max_id)
+        with self._lock:
+            self._keys, self._items = keys, items
+            self._state = state
+        return len(items)
+
+    def _ensure_fresh(self):
+        version = get_version(Ingredient)
+        if self._state != (version, *self.get_db_state()):
+            self.build(version)
+
+    def search(self, term, limit):
+        """
+        Возвращает не более limit ингредиентов: сначала совпадения
+        по началу названия, затем по вхождению подстроки.
+        """
+        self._ensure_fresh()
+        keys, items = self._keys, self._items
+        term = term.casefold()
+        start = bisect_left(keys, term)
+        end = start
+        while end < len(keys) and keys[end].startswith(term):
+            end += 1
+        result = items[start:min(end, start + limit)]
+        if len(result) < limit:
+            for position, key in enumerate(keys):
+                if start <= position < end or term not in key:
+                    continue
+                result.append(items[position])
+                if len(result) == limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import F
+
+from .db_router import primary_reads
+from .models import JournalEntry, JournalPosition, JournalSequence
+
+
+class ChangeJournal:
+    """
+    Журнал изменённых объектов в БД с последовательными номерами, общий
+    для всех процессов. Потребитель запоминает номер последней
+    обработанной записи и получает только новые изменения; если изменений
+    слишком много и старые записи уже удалены, changes_since возвращает
+    None и потребитель обрабатывает все данные заново. Потребители,
+    сохраняющие результат в БД, хранят свой номер там же (position).
+    """
+    max_changes = 1000
+
+    def __init__(self, name):
+        self.name = name
+
+    def _advance(self, delta):
+        """
+        Увеличивает номер журнала в текущей транзакции и возвращает его.
+        UPDATE блокирует строку номера до коммита, поэтому записи
+        с меньшими номерами видны читателям не позже самого номера.
+        """
+        sequences = JournalSequence.objects.filter(name=self.name)
+        if not sequences.update(sequence=F('sequence') + delta):
+            _, created = JournalSequence.objects.get_or_create(
+                name=self.name, defaults={'sequence': delta})
+            if not created:
+                sequences.update(sequence=F('sequence') + delta)
+        with primary_reads():
+            sequence = sequences.values_list('sequence', flat=True).get()
+        JournalEntry.objects.filter(
+            journal=self.name, sequence__lte=sequence - self.max_changes,
+        ).delete()
+        return sequence
+
+    def mark(self, pks):
+        """Записывает изменение pks после коммита текущей транзакции."""
+        pks = list(pks)
+        if pks:
+            transaction.on_commit(lambda: self._mark(pks))
+
+    def _mark(self, pks):
+        with transaction.atomic():
+            last = self._advance(len(pks))
+            JournalEntry.objects.bulk_create(
+                JournalEntry(
+                    journal=self.name, sequence=sequence, object_id=pk)
+                for sequence, pk in enumerate(
+                    pks, start=last - len(pks) + 1)
+            )
+
+    def reset(self):
+        """Заставляет потребителей обработать все данные заново."""
+        transaction.on_commit(self._reset)
+
+    def _reset(self):
+        with transaction.atomic():
+            self._advance(self.max_changes + 1)
+
+    def sequence(self):
+        with primary_reads():
+            sequence = JournalSequence.objects.filter(
+                name=self.name).values_list('sequence', flat=True).first()
+        return sequence or 0
+
+    def changes_since(self, start, sequence):
+        """Возвращает множество pk, изменённых после записи start."""
+        if start is None or sequence < start:
+            return None
+        if sequence - start > self.max_changes:
+            return None
+        with primary_reads():
+            changes = list(JournalEntry.objects.filter(
+                journal=self.name, sequence__gt=start,
+                sequence__lte=sequence,
+            ).values_list('object_id', flat=True))
+        if len(changes) != sequence - start:
+            return None
+        return set(changes)
+
+    def position(self, consumer):
+        """Номер записи, до которой журнал обработан потребителем."""
+        with primary_reads():
+            return JournalPosition.objects.filter(
+                journal=self.name, consumer=consumer,
+            ).values_list('sequence', flat=True).first()
+
+    def set_position(self, consumer, sequence):
+        JournalPosition.objects.update_or_create(
+            journal=self.name, consumer=consumer,
+            defaults={'sequence': sequence})
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management import BaseCommand
+from recipes.recommendations import build
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по совместному добавлению '
+        'в избранное. По умолчанию обновляются только рецепты, избранное '
+        'которых изменилось с прошлого запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать похожие рецепты для всех рецептов.',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=None,
+            help='Сколько похожих рецептов хранить для каждого рецепта.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        updated, full = build(top_k=options['top_k'], full=options['full'])
+        mode = 'полный пересчет' if full else 'пересчет изменений'
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты обновлены ({mode}): {updated} рецептов '
+            f'за {time.monotonic() - start:.2f} с.'))
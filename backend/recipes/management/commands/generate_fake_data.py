@@ -0,0 +1,207 @@
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from recipes.counters import recount
+from recipes.feed import rebuild as rebuild_feeds
+from recipes.models import (CartItem, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscription, Tag)
+from recipes.recipe_ingredient_index import journal as ingredient_journal
+from recipes.recommendations import journal as favorite_journal
+from recipes.search import update_search_vector
+from recipes.versioning import bump_version
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+PASSWORD = 'fake-password'
+TAGS = (
+    {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'breakfast'},
+    {'name': 'Обед', 'color': '#49B64E', 'slug': 'lunch'},
+    {'name': 'Ужин', 'color': '#8775D2', 'slug': 'dinner'},
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет БД синтетическими пользователями, рецептами, избранным, '
+        'корзинами и подписками для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, default=1000,
+            help='Количество новых ингредиентов.')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Избранных рецептов на пользователя.')
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Рецептов в корзине на пользователя.')
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Подписок на пользователя.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--prefix', default='fake',
+            help='Префикс имен пользователей, рецептов и ингредиентов.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только оценить количество строк по таблицам.')
+
+    def _insert(self, table, model, objects):
+        """Вставляет объекты пачками и выводит скорость вставки."""
+        objects = iter(objects)
+        total = 0
+        start = time.monotonic()
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        elapsed = max(time.monotonic() - start, 1e-9)
+        self.stdout.write(
+            f'{table:22} {total:>10} строк за {elapsed:7.2f} с '
+            f'({total / elapsed:,.0f} строк/с)'
+        )
+
+    def _sample_excluding(self, size, excluded, count):
+        """Выборка count различных индексов из range(size) без excluded."""
+        return [
+            index + (index >= excluded)
+            for index in self.rng.sample(range(size - 1), count)
+        ]
+
+    @staticmethod
+    def estimate(options, tags_count):
+        users, recipes = options['users'], options['recipes']
+        average_tags = (1 + tags_count) / 2
+        return {
+            'users': users,
+            'ingredients': options['ingredients'],
+            'recipes': recipes,
+            'recipe_ingredients': recipes * options['ingredients_per_recipe'],
+            'recipe_tags': round(recipes * average_tags),
+            'favorites': users * min(options['favorites'], recipes),
+            'cart_items': users * min(options['carts'], recipes),
+            'subscriptions': users * min(
+                options['subscriptions'], max(users - 1, 0)),
+        }
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = f'{options["prefix"]}_'
+        if self.batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и рецепт.')
+        tags_count = Tag.objects.count() or len(TAGS)
+        if options['dry_run']:
+            for table, rows in self.estimate(options, tags_count).items():
+                self.stdout.write(f'{table:22} ~{rows:>10} строк')
+            return
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Данные с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix.')
+
+        password = make_password(PASSWORD)
+        self._insert('users', User, (
+            User(
+                username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+                first_name='Fake', last_name=str(i), password=password,
+            ) for i in range(options['users'])
+        ))
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix).order_by('id').values_list(
+            'id', flat=True))
+
+        if not Tag.objects.exists():
+            self._insert('tags', Tag, (Tag(**tag) for tag in TAGS))
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+        self._insert('ingredients', Ingredient, (
+            Ingredient(name=f'{prefix}ингредиент {i}', measurement_unit='г')
+            for i in range(options['ingredients'])
+        ))
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        per_recipe = min(options['ingredients_per_recipe'],
+                         len(ingredient_ids))
+
+        self._insert('recipes', Recipe, (
+            Recipe(
+                name=f'{prefix}рецепт {i}', text='Описание рецепта. ' * 10,
+                author_id=self.rng.choice(user_ids),
+                image='images/fake.png',
+                cooking_time=self.rng.randint(1, 120),
+            ) for i in range(options['recipes'])
+        ))
+        recipe_ids = list(Recipe.objects.filter(
+            name__startswith=prefix).order_by('id').values_list(
+            'id', flat=True))
+
+        self._insert('recipe_ingredients', RecipeIngredient, (
+            RecipeIngredient(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=self.rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.rng.sample(ingredient_ids, per_recipe)
+        ))
+
+        RecipeTag = Recipe.tags.through
+        self._insert('recipe_tags', RecipeTag, (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.rng.sample(
+                tag_ids, self.rng.randint(1, len(tag_ids)))
+        ))
+
+        favorites = min(options['favorites'], len(recipe_ids))
+        self._insert('favorites', Favorite, (
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.rng.sample(recipe_ids, favorites)
+        ))
+
+        carts = min(options['carts'], len(recipe_ids))
+        self._insert('cart_items', CartItem, (
+            CartItem(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.rng.sample(recipe_ids, carts)
+        ))
+
+        subscriptions = min(options['subscriptions'], len(user_ids) - 1)
+        self._insert('subscriptions', Subscription, (
+            Subscription(
+                subscriber_id=user_id, author_id=user_ids[author_index])
+            for user_index, user_id in enumerate(user_ids)
+            for author_index in self._sample_excluding(
+                len(user_ids), user_index, subscriptions)
+        ))
+
+        # bulk_create не отправляет сигналы: счетчики, поисковые векторы,
+        # ленты подписок и версии обновляются отдельно.
+        start = time.monotonic()
+        recount()
+        update_search_vector(
+            Recipe.objects.filter(name__startswith=prefix).values('pk'))
+        ingredient_journal.reset()
+        favorite_journal.reset()
+        feed_items = rebuild_feeds()
+        for model in (Tag, Ingredient, Recipe):
+            bump_version(model)
+        self.stdout.write(
+            f'Счетчики пересчитаны, в ленты добавлено {feed_items} записей '
+            f'за {time.monotonic() - start:.2f} с.')
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы.'))
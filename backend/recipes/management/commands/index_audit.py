@@ -0,0 +1,158 @@
+import itertools
+import re
+
+from api.views import RecipeViewSet
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, call_command
+from django.db import connection
+from django.db.models import Count
+from recipes.models import CartItem, Favorite, Tag
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+User = get_user_model()
+
+WARNINGS = (
+    (re.compile(r'\bSCAN \S+$|Seq Scan'), 'полный просмотр таблицы'),
+    (re.compile(r'TEMP B-TREE|\bSort\b'), 'сортировка без индекса'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для страницы списка рецептов при каждой '
+        'комбинации фильтров RecipeFilter и отмечает планы с полным '
+        'просмотром таблиц и сортировкой без индекса, а также индексы, '
+        'которые повторяют другой индекс или являются его префиксом. '
+        'По умолчанию создается тестовая БД с синтетическими данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Проверить планы на данных текущей БД.')
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='EXPLAIN ANALYZE (только PostgreSQL).')
+
+    def handle(self, *args, **options):
+        if options['existing']:
+            self.audit(options)
+            return
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            call_command(
+                'generate_fake_data', users=options['users'],
+                recipes=options['recipes'], favorites=options['favorites'],
+                carts=options['carts'], seed=options['seed'],
+                prefix='audit', stdout=self.stderr,
+            )
+            self.audit(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    @staticmethod
+    def get_combinations(user):
+        """Все сочетания фильтров: теги (один или два), автор, флаги."""
+        slugs = list(Tag.objects.annotate(
+            total=Count('recipe')
+        ).order_by('-total').values_list('slug', flat=True)[:2])
+        tags = [()] + [tuple(slugs[:size]) for size in (1, 2)
+                       if len(slugs) >= size]
+        author = User.objects.annotate(
+            total=Count('recipes')).order_by('-total').first()
+        flags = (
+            ('author', author.pk),
+            ('is_favorited', 1),
+            ('is_in_shopping_cart', 1),
+        )
+        for tag_slugs in tags:
+            for size in range(len(flags) + 1):
+                for chosen in itertools.combinations(flags, size):
+                    yield [('tags', slug) for slug in tag_slugs] + list(
+                        chosen)
+
+    def explain(self, user, params, options):
+        request = APIRequestFactory().get('/api/recipes/', params)
+        force_authenticate(request, user=user)
+        view = RecipeViewSet(
+            request=Request(request), action='list', args=(), kwargs={},
+            format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        return queryset[:view.paginator.page_size].explain(
+            **explain_options)
+
+    @staticmethod
+    def get_redundant_indexes():
+        """
+        Пары (таблица, индекс, другой индекс) в таблицах приложения recipes:
+        индекс по тем же столбцам, что и другой, или неуникальный индекс
+        по префиксу его столбцов.
+        """
+        introspection = connection.introspection
+        tables = sorted({
+            model._meta.db_table for model in apps.get_app_config(
+                'recipes').get_models(include_auto_created=True)
+        })
+        redundant = []
+        with connection.cursor() as cursor:
+            for table in tables:
+                indexes = {
+                    name: info for name, info in
+                    introspection.get_constraints(cursor, table).items()
+                    if (info['index'] or info['unique'])
+                    and not info['primary_key'] and info['columns']
+                    and None not in info['columns']
+                    and info.get('type', 'btree') in ('btree', 'idx')
+                }
+                for name, info in indexes.items():
+                    columns = info['columns']
+                    for other, other_info in indexes.items():
+                        other_columns = other_info['columns']
+                        if other == name:
+                            continue
+                        if columns == other_columns:
+                            if (info['unique'], other) < (
+                                    other_info['unique'], name):
+                                redundant.append((table, name, other))
+                        elif (not info['unique']
+                              and other_columns[:len(columns)] == columns):
+                            redundant.append((table, name, other))
+        return redundant
+
+    def audit(self, options):
+        user = (
+            User.objects.filter(pk__in=Favorite.objects.values('user'))
+            .filter(pk__in=CartItem.objects.values('user')).first()
+            or User.objects.first()
+        )
+        flagged = 0
+        for params in self.get_combinations(user):
+            name = '&'.join(f'{key}={value}' for key, value in params) or '-'
+            plan = self.explain(user, params, options)
+            warnings = sorted({
+                message for line in plan.splitlines()
+                for pattern, message in WARNINGS if pattern.search(line)
+            })
+            if warnings:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: {", ".join(warnings)}'))
+            else:
+                self.stdout.write(f'{name}: OK')
+            if options['verbosity'] > 1 or warnings:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+        self.stdout.write(f'Планов с замечаниями: {flagged}.')
+        redundant = self.get_redundant_indexes()
+        for table, name, other in redundant:
+            self.stdout.write(self.style.WARNING(
+                f'{table}: индекс {name} покрывается индексом {other}'))
+        self.stdout.write(f'Избыточных индексов: {len(redundant)}.')
@@ -1,37 +1,208 @@
 import csv
+import io
+import json
+import re
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient, Tag
+from recipes.versioning import bump_version
 
 FILE_PATH = './data/ingredients.csv'
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+TAGS = (
+    {'name': 'Горячее', 'color': '#FF0000', 'slug': 'hot'},
+    {'name': 'Холодное', 'color': '#00FFFF', 'slug': 'cold'},
+    {'name': 'Десерт', 'color': '#FFFF00', 'slug': 'dessert'},
+)
 
 
 class Command(BaseCommand):
-    help = 'Выполнются команды загрузки ингредиентов и создания тэгов'
+    help = (
+        'Загружает ингредиенты из csv/json - файла пачками и создает тэги. '
+        'Повторный запуск не создает дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=FILE_PATH,
+            help='Путь к файлу ингредиентов (.csv или .json).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одной пачке.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Прочитать файл и посчитать строки без записи в БД.',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже при работе с PostgreSQL.',
+        )
+        parser.add_argument(
+            '--skip-tags',
+            action='store_true',
+            help='Не создавать тэги.',
+        )
+
+    @staticmethod
+    def _read_json_array(file, chunk_size=CHUNK_SIZE):
+        """
+        Отдает элементы JSON-массива по одному, читая файл частями
+        по chunk_size символов: в памяти только текущая часть файла.
+        """
+        decoder = json.JSONDecoder()
+        buffer, position, started, eof = '', 0, False, False
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            char = buffer[position:position + 1]
+            if char and not started:
+                if char != '[':
+                    raise CommandError('JSON-файл должен содержать массив.')
+                position, started = position + 1, True
+                continue
+            if char == ']':
+                return
+            if char == ',':
+                position += 1
+                continue
+            if char:
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # Элемент не поместился в прочитанную часть файла.
+                    pass
+                else:
+                    yield item
+                    continue
+            if eof:
+                raise CommandError('Некорректный или неполный JSON-файл.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+    @classmethod
+    def _read_rows(cls, path):
+        """
+        Читает файл по частям и отдает пары (name, measurement_unit):
+        csv - построчно, json - по одному элементу массива.
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            if path.suffix == '.json':
+                for item in cls._read_json_array(file):
+                    yield item['name'], item['measurement_unit']
+                return
+            for row in csv.reader(file):
+                if row:
+                    yield row[0], row[1]
 
     @staticmethod
-    def _load_ingredients_data():
-        with open(FILE_PATH, 'r', encoding='utf-8') as csv_file:
-            file_reader = csv.reader(csv_file)
-            for row in file_reader:
-                name = row[0]
-                measurement_unit = row[1]
-                Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=measurement_unit
-                )
+    def _batches(rows, batch_size):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def _bulk_create(batch):
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=unit)
+             for name, unit in batch),
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def _copy(batches):
+        """
+        Загружает ингредиенты через COPY во временную таблицу
+        и переносит новые строки одним INSERT ... ON CONFLICT DO NOTHING.
+        """
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE tmp_ingredient '
+                '(name varchar(100), measurement_unit varchar(100)) '
+                'ON COMMIT DROP'
+            )
+            for batch in batches:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY tmp_ingredient FROM STDIN WITH (FORMAT csv)', buffer)
+                yield len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit FROM tmp_ingredient '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+
+    def _load_ingredients_data(self, path, batch_size, dry_run, use_copy):
+        batches = self._batches(self._read_rows(path), batch_size)
+        if dry_run:
+            return sum(len(batch) for batch in batches)
+        total = 0
+        with transaction.atomic():
+            if use_copy:
+                for count in self._copy(batches):
+                    total += count
+                return total
+            for batch in batches:
+                self._bulk_create(batch)
+                total += len(batch)
+        return total
 
     @staticmethod
     def _create_tags():
-        data = [
-            {'name': 'Горячее', 'color': '#FF0000', 'slug': 'hot'},
-            {'name': 'Холодное', 'color': '#00FFFF', 'slug': 'cold'},
-            {'name': 'Десерт', 'color': '#FFFF00', 'slug': 'dessert'},
-        ]
-        for tag_data in data:
-            Tag.objects.create(**tag_data)
+        Tag.objects.bulk_create(
+            (Tag(**tag_data) for tag_data in TAGS),
+            update_conflicts=True,
+            unique_fields=('slug',),
+            update_fields=('name', 'color'),
+        )
 
     def handle(self, *args, **options):
-        self._load_ingredients_data()
-        self._create_tags()
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        use_copy = (
+            connection.vendor == 'postgresql'
+            and not options['no_copy']
+            and not options['dry_run']
+        )
+        start = time.monotonic()
+        rows = self._load_ingredients_data(
+            path, options['batch_size'], options['dry_run'], use_copy)
+        elapsed = max(time.monotonic() - start, 1e-9)
+        self.stdout.write(
+            f'Ингредиенты: {rows} строк за {elapsed:.2f} с '
+            f'({rows / elapsed:.0f} строк/с, '
+            f'{"COPY" if use_copy else "bulk_create"}).'
+        )
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING('Пробный запуск: данные не записаны.'))
+            return
+        # bulk_create и COPY не отправляют сигналы post_save.
+        bump_version(Ingredient)
+        if not options['skip_tags']:
+            self._create_tags()
+            bump_version(Tag)
         self.stdout.write(
             self.style.SUCCESS('Данные успешно загружены и тэги созданы.'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from recipes.images import make_thumbnails, run_task, thumbnails_outdated
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт уменьшенные копии изображений рецептов, для которых '
+        'они отсутствуют или устарели.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        fields = ('image', *(
+            f'image_{size}' for size in settings.RECIPE_IMAGE_SIZES))
+        recipes = Recipe.objects.exclude(image='').only(*fields).order_by('pk')
+        processed = 0
+        for recipe in recipes.iterator():
+            if options['all'] or thumbnails_outdated(recipe):
+                run_task(make_thumbnails, recipe.pk)
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}.'))
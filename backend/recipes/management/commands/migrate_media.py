@@ -0,0 +1,117 @@
+import os
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from recipes.images import make_thumbnails, run_task
+from recipes.models import Recipe
+from recipes.storage import is_content_addressed
+
+MEDIA_DIR = 'images'
+IMAGE_FIELDS = ('image', 'image_thumb', 'image_detail')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит изображения рецептов в хранилище с именами по хешу '
+        'содержимого и удаляет файлы, на которые не ссылается ни один рецепт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет сделано, не изменяя данные.',
+        )
+        parser.add_argument(
+            '--no-gc',
+            action='store_true',
+            help='Не удалять неиспользуемые файлы.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            metavar='MINUTES',
+            help=(
+                'Не удалять файлы моложе указанного возраста: они могут '
+                'принадлежать рецептам, которые ещё сохраняются.'
+            ),
+        )
+
+    def migrate(self, storage, dry_run):
+        migrated = missing = 0
+        recipes = Recipe.objects.exclude(image='').only('image')
+        for recipe in recipes.order_by('pk').iterator():
+            name = recipe.image.name
+            if is_content_addressed(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Рецепт {recipe.pk}: файл {name} не найден.'))
+                continue
+            migrated += 1
+            if dry_run:
+                continue
+            with storage.open(name, 'rb') as file:
+                new_name = storage.save(name, file)
+            Recipe.objects.filter(
+                pk=recipe.pk, image=name).update(image=new_name)
+            run_task(make_thumbnails, recipe.pk)
+        return migrated, missing
+
+    @staticmethod
+    def walk(storage, path):
+        directories, files = storage.listdir(path)
+        for file in files:
+            yield os.path.join(path, file)
+        for directory in directories:
+            yield from Command.walk(storage, os.path.join(path, directory))
+
+    @staticmethod
+    def is_referenced(name):
+        return Recipe.objects.filter(
+            Q(image=name) | Q(image_thumb=name) | Q(image_detail=name)
+        ).exists()
+
+    def collect_garbage(self, storage, min_age, dry_run):
+        referenced = set()
+        for names in Recipe.objects.values_list(*IMAGE_FIELDS).iterator():
+            referenced.update(names)
+        threshold = timezone.now() - timedelta(minutes=min_age)
+        deleted = freed = 0
+        if not storage.exists(MEDIA_DIR):
+            return deleted, freed
+        for name in self.walk(storage, MEDIA_DIR):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > threshold:
+                continue
+            # Ссылка могла появиться после чтения списка ссылок.
+            if self.is_referenced(name):
+                continue
+            deleted += 1
+            freed += storage.size(name)
+            if not dry_run:
+                storage.delete(name)
+        return deleted, freed
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = Recipe._meta.get_field('image').storage
+        migrated, missing = self.migrate(storage, dry_run)
+        self.stdout.write(
+            f'Перенесено изображений: {migrated}, не найдено: {missing}.')
+        if not options['no_gc']:
+            deleted, freed = self.collect_garbage(
+                storage, options['min_age'], dry_run)
+            self.stdout.write(
+                f'Удалено неиспользуемых файлов: {deleted} '
+                f'({freed / 1024 / 1024:.1f} МБ).')
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING('Пробный запуск: данные не изменены.'))
+            return
+        self.stdout.write(self.style.SUCCESS('Готово.'))
@@ -0,0 +1,70 @@
+import json
+from collections import defaultdict
+
+from django.core.management import BaseCommand, CommandError
+
+METRICS = (
+    'queries', 'duplicates', 'sql_ms', 'serializer_ms', 'app_ms', 'total_ms',
+)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит отчет по эндпоинтам API из журнала QueryProfilingMiddleware: '
+        'перцентили количества и времени SQL-запросов и сериализации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log_file', help='Файл журнала api.profiling.')
+        parser.add_argument(
+            '--percentiles',
+            default='50,95,99',
+            help='Перцентили через запятую.',
+        )
+
+    @staticmethod
+    def _read_records(path):
+        samples = defaultdict(lambda: defaultdict(list))
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                start = line.find('{')
+                if start == -1:
+                    continue
+                try:
+                    record = json.loads(line[start:])
+                except ValueError:
+                    continue
+                for metric in METRICS:
+                    # В старых записях журнала нет serializer_ms.
+                    if metric in record:
+                        samples[record['endpoint']][metric].append(
+                            record[metric])
+        return samples
+
+    def handle(self, *args, **options):
+        try:
+            percents = [
+                float(value) for value in options['percentiles'].split(',')]
+            samples = self._read_records(options['log_file'])
+        except ValueError:
+            raise CommandError('Неверный список перцентилей.')
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать журнал: {error}')
+        for endpoint in sorted(samples):
+            metrics = samples[endpoint]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{endpoint} (обращений: {len(metrics["queries"])})'))
+            for metric in METRICS:
+                if not metrics[metric]:
+                    continue
+                values = ', '.join(
+                    f'p{percent:g}={percentile(metrics[metric], percent):g}'
+                    for percent in percents
+                )
+                self.stdout.write(f'  {metric}: {values}')
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management import BaseCommand
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ленты подписок заново по текущим подпискам и рецептам. '
+        'Нужна после массовой загрузки данных или изменения '
+        'FEED_FANOUT_LIMIT и FEED_BACKFILL_SIZE.'
+    )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        created = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты заполнены: {created} записей '
+            f'за {time.monotonic() - start:.2f} с.'))
@@ -0,0 +1,25 @@
+from api.mixins import AnonymousResponseCacheMixin
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий в кэш ответов рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счетчики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        stats = AnonymousResponseCacheMixin.get_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total * 100 if total else 0
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {ratio:.1f}%.'
+        )
+        if options['reset']:
+            AnonymousResponseCacheMixin.reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики обнулены.'))
@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики рецептов, подписчиков, избранного и корзины '
+        'и исправляет расхождения с фактическими данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount(dry_run=options['dry_run'])
+        for counter, drifted in fixed.items():
+            self.stdout.write(f'{counter}: расхождений {drifted}')
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING('Пробный запуск: данные не изменены.'))
+            return
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
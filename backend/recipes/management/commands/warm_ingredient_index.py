@@ -0,0 +1,61 @@
+import time
+
+from django.core.management import BaseCommand
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+SAMPLE_TERMS = ('а', 'сок', 'мол', 'сыр', 'перец', 'яйц', 'zzz')
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит индекс ингредиентов для автодополнения и, при необходимости, '
+        'сравнивает скорость поиска по индексу и через ORM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            default=0,
+            metavar='N',
+            help='Выполнить N повторов поиска по каждому тестовому запросу.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Максимальное количество результатов поиска.',
+        )
+
+    @staticmethod
+    def _search_orm(term, limit):
+        return list(Ingredient.objects.filter(
+            name__icontains=term
+        ).values('id', 'name', 'measurement_unit')[:limit])
+
+    @staticmethod
+    def _measure(search, repeat, limit):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for term in SAMPLE_TERMS:
+                search(term, limit)
+        return (time.perf_counter() - start) / (repeat * len(SAMPLE_TERMS))
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        size = ingredient_index.build()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс построен: {size} ингредиентов за {elapsed:.1f} мс.'))
+        repeat = options['benchmark']
+        if repeat < 1:
+            return
+        limit = options['limit']
+        index_time = self._measure(ingredient_index.search, repeat, limit)
+        orm_time = self._measure(self._search_orm, repeat, limit)
+        self.stdout.write(
+            f'Индекс: {index_time * 1e6:.1f} мкс/запрос, '
+            f'ORM: {orm_time * 1e6:.1f} мкс/запрос, '
+            f'ускорение x{orm_time / index_time:.1f}.'
+        )
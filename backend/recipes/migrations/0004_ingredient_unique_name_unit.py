@@ -0,0 +1,42 @@
+# Generated by Django 4.1.4 on 2026-10-18 18:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in duplicates:
+        extra_ids = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True)
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+                ingredient_id__in=list(extra_ids)):
+            if RecipeIngredient.objects.filter(
+                    recipe_id=recipe_ingredient.recipe_id,
+                    ingredient_id=group['keep_id']).exists():
+                recipe_ingredient.delete()
+            else:
+                recipe_ingredient.ingredient_id = group['keep_id']
+                recipe_ingredient.save(update_fields=['ingredient'])
+        Ingredient.objects.filter(id__in=list(extra_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_alter_recipeingredient_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1.4 on 2026-10-18 18:56
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_INDEX = 'recipes_recipe_search_vector_idx'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    GIN-индекс и начальное заполнение вектора создаются только
+    на PostgreSQL, на SQLite поиск работает без сохранённого вектора.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        """
+        UPDATE recipes_recipe AS r SET search_vector =
+            setweight(to_tsvector(%s::regconfig, r.name), 'A')
+            || setweight(to_tsvector(%s::regconfig, COALESCE((
+                SELECT string_agg(i.name, ' ')
+                FROM recipes_recipeingredient AS ri
+                JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+                WHERE ri.recipe_id = r.id
+            ), '')), 'B')
+            || setweight(to_tsvector(%s::regconfig, r.text), 'C')
+        """,
+        [settings.RECIPE_SEARCH_CONFIG] * 3,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
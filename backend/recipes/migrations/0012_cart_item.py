@@ -0,0 +1,72 @@
+# Generated by Django 4.1.4 on 2026-10-18 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+
+def copy_cart_items(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    CartItem = apps.get_model('recipes', 'CartItem')
+    # Время добавления в старой схеме не хранилось.
+    now = timezone.now()
+    rows = ShoppingCart.recipe.through.objects.filter(
+        shoppingcart__user__isnull=False,
+    ).values_list('shoppingcart__user_id', 'recipe_id').iterator()
+    batch = []
+    for user_id, recipe_id in rows:
+        batch.append(
+            CartItem(user_id=user_id, recipe_id=recipe_id, added_at=now))
+        if len(batch) == BATCH_SIZE:
+            CartItem.objects.bulk_create(batch)
+            batch = []
+    CartItem.objects.bulk_create(batch)
+
+
+def copy_shopping_carts(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    CartItem = apps.get_model('recipes', 'CartItem')
+    user_ids = CartItem.objects.order_by().values_list(
+        'user_id', flat=True).distinct()
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user_id=user_id) for user_id in user_ids)
+    carts = dict(ShoppingCart.objects.values_list('user_id', 'id'))
+    CartRecipe = ShoppingCart.recipe.through
+    CartRecipe.objects.bulk_create((
+        CartRecipe(shoppingcart_id=carts[user_id], recipe_id=recipe_id)
+        for user_id, recipe_id in CartItem.objects.values_list(
+            'user_id', 'recipe_id').iterator()
+    ), batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0011_feed_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в корзине',
+                'verbose_name_plural': 'Рецепты в корзине',
+                'ordering': ['-added_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_cart_item'),
+        ),
+        migrations.RunPython(copy_cart_items, copy_shopping_carts),
+    ]
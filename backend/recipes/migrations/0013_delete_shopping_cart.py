@@ -0,0 +1,16 @@
+# Generated by Django 4.1.4 on 2026-10-18 19:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_cart_item'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ShoppingCart',
+        ),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 4.1.4 on 2026-10-18 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+AUTHOR_INDEX = 'recipe_author_id_desc_idx'
+TAG_RECIPE_INDEX = 'recipe_tags_tag_recipe_idx'
+
+
+def drop_column_indexes(schema_editor, table, column):
+    """Удаляет неуникальные индексы таблицы по одному столбцу column."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, info in constraints.items():
+        if (info['index'] and not info['unique'] and not info['primary_key']
+                and info['columns'] == [column]):
+            schema_editor.execute(
+                f'DROP INDEX {schema_editor.quote_name(name)}')
+
+
+def restore_field_index(schema_editor, model, name):
+    schema_editor.execute(schema_editor._create_index_sql(
+        model, fields=[model._meta.get_field(name)]))
+
+
+def create_filter_indexes(apps, schema_editor):
+    """
+    Индекс (tag_id, recipe_id) таблицы тегов рецептов отвечает на фильтр
+    по тегам без обращения к таблице; индексы по tag_id и recipe_id
+    покрываются им и уникальным (recipe_id, tag_id).
+    На PostgreSQL индекс по author_id заменяется индексом (author_id,
+    id DESC): рецепты автора выбираются в порядке списка без сортировки.
+    На SQLite индекс по author_id и так упорядочен по rowid, то есть по
+    id, а явный столбец id только мешает планировщику.
+    """
+    quote = schema_editor.quote_name
+    through = apps.get_model('recipes', 'Recipe').tags.through
+    table = through._meta.db_table
+    columns = [
+        through._meta.get_field(name).column for name in ('tag', 'recipe')]
+    schema_editor.execute(
+        f'CREATE INDEX {quote(TAG_RECIPE_INDEX)} ON {quote(table)} '
+        f'({", ".join(quote(column) for column in columns)})')
+    for column in columns:
+        drop_column_indexes(schema_editor, table, column)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {AUTHOR_INDEX} '
+        'ON recipes_recipe (author_id, id DESC)'
+    )
+    drop_column_indexes(schema_editor, 'recipes_recipe', 'author_id')
+
+
+def drop_filter_indexes(apps, schema_editor):
+    recipe = apps.get_model('recipes', 'Recipe')
+    through = recipe.tags.through
+    schema_editor.execute(
+        f'DROP INDEX {schema_editor.quote_name(TAG_RECIPE_INDEX)}')
+    for name in ('recipe', 'tag'):
+        restore_field_index(schema_editor, through, name)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    restore_field_index(schema_editor, recipe, 'author')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {AUTHOR_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_delete_shopping_cart'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favorite',
+            options={'ordering': ['user', 'recipe'], 'verbose_name': 'Избранный рецепт', 'verbose_name_plural': 'Избранные рецепты'},
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ['-id'], 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='favorite',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipe',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipeingredient',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='subscription',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='feeditem',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='ingredient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient'),
+        ),
+        migrations.AlterField(
+            model_name='recipeneighbor',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='recipes.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscription', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.RunPython(create_filter_indexes, drop_filter_indexes),
+    ]
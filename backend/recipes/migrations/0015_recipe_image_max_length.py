@@ -0,0 +1,29 @@
+# Generated by Django 4.1.4 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(max_length=255, storage=recipes.storage.ContentAddressedStorage(), upload_to='images/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_detail',
+            field=models.ImageField(blank=True, editable=False, max_length=255, upload_to='images/thumbs/', verbose_name='Изображение для страницы рецепта'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_thumb',
+            field=models.ImageField(blank=True, editable=False, max_length=255, upload_to='images/thumbs/', verbose_name='Изображение для карточки'),
+        ),
+    ]
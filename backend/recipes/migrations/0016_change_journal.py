@@ -0,0 +1,41 @@
+# Generated by Django 4.1.4 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_image_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal', models.CharField(max_length=64, verbose_name='Журнал')),
+                ('sequence', models.PositiveBigIntegerField(verbose_name='Номер записи')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Изменённый объект')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала изменений',
+                'verbose_name_plural': 'Записи журналов изменений',
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalSequence',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Журнал')),
+                ('sequence', models.PositiveBigIntegerField(default=0, verbose_name='Номер записи')),
+            ],
+            options={
+                'verbose_name': 'Журнал изменений',
+                'verbose_name_plural': 'Журналы изменений',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='journalentry',
+            constraint=models.UniqueConstraint(fields=('journal', 'sequence'), name='unique_journal_entry'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.4 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_change_journal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal', models.CharField(max_length=64, verbose_name='Журнал')),
+                ('consumer', models.CharField(max_length=64, verbose_name='Потребитель')),
+                ('sequence', models.PositiveBigIntegerField(verbose_name='Номер записи')),
+            ],
+            options={
+                'verbose_name': 'Позиция в журнале изменений',
+                'verbose_name_plural': 'Позиции в журналах изменений',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='journalposition',
+            constraint=models.UniqueConstraint(fields=('journal', 'consumer'), name='unique_journal_position'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 from api.validators import validate_color
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
 from django.urls import reverse
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -62,6 +66,32 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_unit'
+            )
+        ]
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует рецепты флагами is_favorited и is_in_shopping_cart
+        для пользователя, чтобы не выполнять запрос на каждый рецепт.
+        """
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(CartItem.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
 
 
 class Recipe(models.Model):
@@ -73,15 +103,35 @@ class Recipe(models.Model):
         'Описание',
         max_length=1000
     )
+    # На PostgreSQL индекс по author_id заменен индексом (author_id, id
+    # DESC) в миграции recipes.0014.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор',
     )
+    # Имена по sha256 содержимого длиннее 100 символов по умолчанию:
+    # images/thumbs/ab/<64 символа>_detail_1200x1200q80.webp.
     image = models.ImageField(
         'Изображение',
         upload_to='images/',
+        storage=ContentAddressedStorage(),
+        max_length=255,
+    )
+    image_thumb = models.ImageField(
+        'Изображение для карточки',
+        upload_to='images/thumbs/',
+        blank=True,
+        editable=False,
+        max_length=255,
+    )
+    image_detail = models.ImageField(
+        'Изображение для страницы рецепта',
+        upload_to='images/thumbs/',
+        blank=True,
+        editable=False,
+        max_length=255,
     )
     cooking_time = models.PositiveSmallIntegerField(
         'Время приготовления',
@@ -98,6 +148,23 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавления в избранное',
+        default=0,
+        editable=False,
+    )
+    in_cart_count = models.PositiveIntegerField(
+        'Добавления в корзину',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     def get_absolute_url(self):
         return reverse(
@@ -109,7 +176,9 @@ class Recipe(models.Model):
         return f'Название: {self.name}'
 
     class Meta:
-        ordering = ['-id', 'name']
+        # id уникален, поэтому сортировка по name ничего не добавляла,
+        # но мешала брать порядок из индексов.
+        ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         constraints = [
@@ -118,7 +187,6 @@ class Recipe(models.Model):
                 name='unique_recipe_author'
             )
         ]
-        unique_together = ['name', 'author']
 
 
 class Favorite(models.Model):
@@ -127,68 +195,187 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites'
     )
+    # Поиск по user_id обслуживает индекс unique_user_favorite_recipe.
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='favorites'
+        related_name='favorites',
+        db_index=False,
     )
 
     def __str__(self):
         return f'Пользователь: {self.user}. Рецепт: {self.recipe}.'
 
     class Meta:
-        ordering = ['recipe', 'user']
+        # Порядок совпадает с индексом unique_user_favorite_recipe:
+        # избранное пользователя читается из индекса без сортировки.
+        ordering = ['user', 'recipe']
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
         constraints = [
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique_user_favorite_recipe')
         ]
-        unique_together = ['user', 'recipe']
 
 
-class ShoppingCart(models.Model):
-    recipe = models.ManyToManyField(
+class CartItem(models.Model):
+    # Поиск по user_id обслуживает индекс unique_cart_item.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Пользователь',
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Рецепт',
+    )
+    added_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+    )
+
+    def __str__(self):
+        return f'Пользователь: {self.user}. Рецепт: {self.recipe}.'
+
+    class Meta:
+        ordering = ['-added_at']
+        verbose_name = 'Рецепт в корзине'
+        verbose_name_plural = 'Рецепты в корзине'
+        constraints = [
+            # Индекс (user_id, recipe_id) обслуживает и проверку рецепта
+            # в корзине, и выборку всей корзины пользователя.
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_cart_item'
+            )
+        ]
+
+
+class RecipeNeighbor(models.Model):
+    # Поиск по recipe_id обслуживает индекс unique_recipe_neighbor.
+    recipe = models.ForeignKey(
         Recipe,
-        related_name='shopping_cart'
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        db_index=False,
     )
-    user = models.OneToOneField(
-        User,
+    neighbor = models.ForeignKey(
+        Recipe,
         on_delete=models.CASCADE,
-        related_name='shopping_cart',
-        null=True,
+        related_name='+',
     )
+    score = models.FloatField('Сходство')
 
-    def create_shopping_list(self):
-        """
-        Этот метод создает список покупок на основе связанных объектов Recipe.
-        Каждый элемент списка имеет следующий формат:
-        'Название ингредиента (единицы): количество'.
-        """
-        data = {}
+    def __str__(self):
+        return f'Рецепт:{self.recipe_id}. Похожий:{self.neighbor_id}.'
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbor'],
+                name='unique_recipe_neighbor'
+            )
+        ]
 
-        for recipe in self.recipe.all():
-            for recipeingredient in recipe.recipeingredient_set.all():
-                ingredient = recipeingredient.ingredient
-                key = f'{ingredient.name} ({ingredient.measurement_unit})'
-                data.setdefault(key, 0)
-                data[key] += recipeingredient.amount
 
-        shopping_list = ['Список покупок:\n']
+class JournalSequence(models.Model):
+    """Номер последней записи журнала изменений (recipes.journal)."""
+    name = models.CharField('Журнал', max_length=64, primary_key=True)
+    sequence = models.PositiveBigIntegerField('Номер записи', default=0)
+
+    def __str__(self):
+        return f'Журнал {self.name}: {self.sequence}.'
+
+    class Meta:
+        verbose_name = 'Журнал изменений'
+        verbose_name_plural = 'Журналы изменений'
 
-        for key, value in data.items():
-            item = f'- {key}: {value} \n'
-            shopping_list.append(item)
 
-        return shopping_list
+class JournalEntry(models.Model):
+    journal = models.CharField('Журнал', max_length=64)
+    sequence = models.PositiveBigIntegerField('Номер записи')
+    object_id = models.PositiveBigIntegerField('Изменённый объект')
 
     def __str__(self):
-        return f'Пользователь: {self.user}. Рецепт: {self.recipe}.'
+        return f'Журнал {self.journal}. Запись {self.sequence}.'
 
     class Meta:
-        ordering = ['-id']
-        verbose_name = 'Рецепт в корзине'
-        verbose_name_plural = 'Рецепты в корзине'
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Записи журналов изменений'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['journal', 'sequence'],
+                name='unique_journal_entry'
+            )
+        ]
+
+
+class JournalPosition(models.Model):
+    """Номер записи журнала, до которой его обработал потребитель."""
+    journal = models.CharField('Журнал', max_length=64)
+    consumer = models.CharField('Потребитель', max_length=64)
+    sequence = models.PositiveBigIntegerField('Номер записи')
+
+    def __str__(self):
+        return f'Журнал {self.journal}. {self.consumer}: {self.sequence}.'
+
+    class Meta:
+        verbose_name = 'Позиция в журнале изменений'
+        verbose_name_plural = 'Позиции в журналах изменений'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['journal', 'consumer'],
+                name='unique_journal_position'
+            )
+        ]
+
+
+class FeedItem(models.Model):
+    # Поиск по user_id обслуживает индекс unique_feed_item.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+
+    def __str__(self):
+        return f'Лента {self.user_id}. Рецепт:{self.recipe_id}.'
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_item_user_author_idx'
+            )
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -196,9 +383,11 @@ class RecipeIngredient(models.Model):
         Recipe,
         on_delete=models.CASCADE
     )
+    # Поиск по ingredient_id обслуживает индекс unique_ingredient_recipe.
     ingredient = models.ForeignKey(
         Ingredient,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField(
         'Количество',
@@ -212,7 +401,6 @@ class RecipeIngredient(models.Model):
         return f'Рецепт:{self.recipe}. Ингредиент:{self.ingredient}.'
 
     class Meta:
-        ordering = ['recipe__name']
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
         constraints = [
@@ -221,15 +409,16 @@ class RecipeIngredient(models.Model):
                 name='unique_ingredient_recipe'
             )
         ]
-        unique_together = ['ingredient', 'recipe']
 
 
 class Subscription(models.Model):
+    # Поиск по author_id обслуживает индекс unique_subscriptions.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         verbose_name='Автор',
         related_name='subscription',
+        db_index=False,
     )
     subscriber = models.ForeignKey(
         User,
@@ -246,7 +435,6 @@ class Subscription(models.Model):
                 fields=['author', 'subscriber'], name='unique_subscriptions'
             )
         ]
-        unique_together = ['author', 'subscriber']
 
     def __str__(self):
         return (
@@ -0,0 +1,107 @@
+import heapq
+import threading
+from collections import Counter, defaultdict
+from itertools import chain
+
+from .db_router import primary_reads
+from .journal import ChangeJournal
+from .models import RecipeIngredient
+
+journal = ChangeJournal('recipe_ingredient_index')
+
+
+class RecipeIngredientIndex:
+    """
+    Обратный индекс «ингредиент -> рецепты» в памяти процесса для подбора
+    рецептов по имеющимся продуктам. Ответ строится по спискам рецептов
+    переданных ингредиентов, без обращения к базе данных. Изменённые
+    рецепты записываются в journal, и каждый процесс перечитывает только их.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = None
+        self._recipes = {}
+        self._postings = defaultdict(set)
+
+    @staticmethod
+    def _load(recipe_ids=None):
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id')
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        recipes = defaultdict(set)
+        # Реплика может еще не получить изменения из журнала.
+        with primary_reads():
+            for recipe_id, ingredient_id in rows.iterator():
+                recipes[recipe_id].add(ingredient_id)
+        return recipes
+
+    def build(self, sequence=None):
+        if sequence is None:
+            sequence = journal.sequence()
+        recipes = self._load()
+        postings = defaultdict(set)
+        for recipe_id, ingredients in recipes.items():
+            for ingredient_id in ingredients:
+                postings[ingredient_id].add(recipe_id)
+        with self._lock:
+            self._recipes = {
+                recipe_id: frozenset(ingredients)
+                for recipe_id, ingredients in recipes.items()
+            }
+            self._postings = postings
+            self._sequence = sequence
+        return len(recipes)
+
+    def _apply(self, recipe_ids, sequence):
+        recipes = self._load(recipe_ids)
+        with self._lock:
+            for recipe_id in recipe_ids:
+                for ingredient_id in self._recipes.pop(recipe_id, ()):
+                    self._postings[ingredient_id].discard(recipe_id)
+                ingredients = recipes.get(recipe_id)
+                if not ingredients:
+                    continue
+                self._recipes[recipe_id] = frozenset(ingredients)
+                for ingredient_id in ingredients:
+                    self._postings[ingredient_id].add(recipe_id)
+            self._sequence = sequence
+
+    def _ensure_fresh(self):
+        sequence = journal.sequence()
+        if self._sequence == sequence:
+            return
+        changes = journal.changes_since(self._sequence, sequence)
+        if changes is None:
+            self.build(sequence)
+        else:
+            self._apply(changes, sequence)
+
+    def match(self, ingredient_ids, limit):
+        """
+        Возвращает не более limit троек (recipe_id, matched, total):
+        рецепты, в которых есть хотя бы один из ингредиентов, по убыванию
+        доли имеющихся ингредиентов, затем по числу недостающих.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            matched = Counter(chain.from_iterable(
+                self._postings.get(ingredient_id, ())
+                for ingredient_id in set(ingredient_ids)
+            ))
+            recipes = self._recipes
+            # При равной доле недостающих меньше у рецепта с меньшим
+            # числом совпадений, поэтому оно сортируется по возрастанию.
+            ranked = heapq.nsmallest(limit, (
+                (-count / total, count, -recipe_id, total)
+                for recipe_id, count in matched.items()
+                for total in (len(recipes[recipe_id]),)
+            ))
+        return [
+            (-recipe_id, count, total)
+            for _, count, recipe_id, total in ranked
+        ]
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
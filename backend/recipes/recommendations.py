@@ -0,0 +1,176 @@
+import heapq
+from collections import defaultdict
+from itertools import chain, zip_longest
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from scipy import sparse
+
+from .journal import ChangeJournal
+from .models import Favorite, Recipe, RecipeNeighbor
+
+journal = ChangeJournal('recommendations')
+JOURNAL_CONSUMER = 'neighbors'
+
+
+def top_neighbors(matrix, recipe_ids, top_k):
+    """
+    Выбирает для каждой строки разреженной матрицы сходства top_k
+    наибольших значений. Возвращает {recipe_id: [(neighbor_id, score)]}.
+    """
+    matrix = matrix.tocsr()
+    neighbors = {}
+    for row, recipe_id in enumerate(recipe_ids):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        scores = matrix.data[start:end]
+        columns = matrix.indices[start:end]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            scores, columns = scores[best], columns[best]
+        neighbors[recipe_id] = [
+            (int(recipe_ids[column]), float(score))
+            for column, score in zip(columns, scores)
+        ]
+    return neighbors
+
+
+def build_all(top_k):
+    """
+    Полный пересчёт: матрица «пользователь x рецепт» из Favorite,
+    совместная встречаемость A.T @ A и косинусная нормировка
+    c_ij / sqrt(n_i * n_j), где n_i — число добавлений рецепта в избранное.
+    """
+    rows = np.array(
+        Favorite.objects.values_list('user_id', 'recipe_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    if not len(rows):
+        return {}
+    user_ids, users = np.unique(rows[:, 0], return_inverse=True)
+    recipe_ids, recipes = np.unique(rows[:, 1], return_inverse=True)
+    favorites = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (users, recipes)),
+        shape=(len(user_ids), len(recipe_ids)),
+    )
+    cooccurrence = (favorites.T @ favorites).tocsr()
+    norm = sparse.diags(1 / np.sqrt(cooccurrence.diagonal()))
+    similarity = (norm @ cooccurrence @ norm).tolil()
+    similarity.setdiag(0)
+    similarity = similarity.tocsr()
+    similarity.eliminate_zeros()
+    return top_neighbors(similarity, recipe_ids, top_k)
+
+
+def cooccurrence(recipe_ids):
+    """Совместная встречаемость рецептов в избранном одним GROUP BY."""
+    pairs = Favorite.objects.filter(recipe_id__in=recipe_ids).values(
+        'recipe_id', other_id=F('user__favorites__recipe_id'),
+    ).annotate(count=Count('pk')).order_by()
+    counts = defaultdict(dict)
+    for pair in pairs:
+        counts[pair['recipe_id']][pair['other_id']] = pair['count']
+    return counts
+
+
+def build_changed(changed_ids, top_k):
+    """
+    Пересчёт только изменившихся строк. Изменение избранного для рецепта
+    меняет его собственную строку и сходство с ним во всех строках,
+    где он встречается, поэтому пересчитываются и эти рецепты.
+    """
+    affected = set(changed_ids)
+    for counts in cooccurrence(changed_ids).values():
+        affected.update(counts)
+    affected.update(RecipeNeighbor.objects.filter(
+        neighbor_id__in=changed_ids).values_list('recipe_id', flat=True))
+    counts = cooccurrence(affected)
+    totals = dict(Favorite.objects.filter(
+        recipe_id__in=set(chain.from_iterable(counts.values()))
+    ).values('recipe_id').annotate(
+        count=Count('pk')
+    ).values_list('recipe_id', 'count').order_by())
+    neighbors = {recipe_id: [] for recipe_id in affected}
+    for recipe_id, row in counts.items():
+        total = row.pop(recipe_id)
+        neighbors[recipe_id] = heapq.nlargest(top_k, (
+            (other_id, count / (total * totals[other_id]) ** 0.5)
+            for other_id, count in row.items()
+        ), key=lambda item: item[1])
+    return neighbors
+
+
+def store(neighbors):
+    with transaction.atomic():
+        RecipeNeighbor.objects.filter(recipe_id__in=list(neighbors)).delete()
+        RecipeNeighbor.objects.bulk_create((
+            RecipeNeighbor(
+                recipe_id=recipe_id, neighbor_id=neighbor_id, score=score)
+            for recipe_id, items in neighbors.items()
+            for neighbor_id, score in items
+        ), batch_size=5000)
+
+
+def build(top_k=None, full=False):
+    """
+    Обновляет сохранённых соседей рецептов. По умолчанию пересчитываются
+    только рецепты из журнала изменений избранного; если журнал неполон
+    или full=True, соседи пересчитываются для всех рецептов.
+    Возвращает количество обновлённых рецептов и признак полного пересчёта.
+    """
+    top_k = top_k or settings.RECOMMENDATION_NEIGHBORS
+    sequence = journal.sequence()
+    changed = None
+    if not full:
+        changed = journal.changes_since(
+            journal.position(JOURNAL_CONSUMER), sequence)
+    neighbors = None if changed is None else build_changed(changed, top_k)
+    # Позиция сохраняется вместе с соседями: после сбоя изменения
+    # не будут пропущены при следующем запуске.
+    with transaction.atomic():
+        if neighbors is None:
+            RecipeNeighbor.objects.all().delete()
+            store(build_all(top_k))
+            updated, full = Recipe.objects.count(), True
+        else:
+            store(neighbors)
+            updated = len(neighbors)
+        journal.set_position(JOURNAL_CONSUMER, sequence)
+    return updated, full
+
+
+def recommend(user, limit):
+    """
+    Возвращает id рекомендованных рецептов: похожие на недавно
+    добавленные в избранное вперемешку с новыми рецептами авторов
+    из подписок, а если их не хватает — популярные рецепты.
+    Количество запросов не зависит от объёма данных.
+    """
+    seeds = list(Favorite.objects.filter(user=user).order_by(
+        '-id').values_list('recipe_id', flat=True)[
+            :settings.RECOMMENDATION_SEEDS])
+    scores = defaultdict(float)
+    if seeds:
+        for neighbor_id, score in RecipeNeighbor.objects.filter(
+                recipe_id__in=seeds).values_list('neighbor_id', 'score'):
+            scores[neighbor_id] += score
+    similar = heapq.nlargest(limit * 2, scores, key=scores.get)
+    followed = Recipe.objects.filter(
+        author__subscription__subscriber=user
+    ).order_by('-id').values_list('id', flat=True)[:limit]
+    excluded = set(seeds)
+    excluded.update(Recipe.objects.filter(
+        author=user, pk__in=similar).values_list('id', flat=True))
+    result = []
+    for recipe_id in chain.from_iterable(zip_longest(similar, followed)):
+        if recipe_id is None or recipe_id in excluded:
+            continue
+        excluded.add(recipe_id)
+        result.append(recipe_id)
+        if len(result) == limit:
+            return result
+    popular = Recipe.objects.exclude(pk__in=excluded).exclude(
+        author=user).order_by('-favorites_count', '-id').values_list(
+            'id', flat=True)[:limit - len(result)]
+    return result + list(popular)
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, router
+from django.db.models import (Case, Exists, F, FloatField, OuterRef, Q,
+                              Subquery, TextField, Value, When)
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeIngredient
+
+
+def search_enabled(using='default'):
+    """Полнотекстовый поиск доступен только на PostgreSQL."""
+    return connections[using].vendor == 'postgresql'
+
+
+def ingredient_names():
+    return Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' ')
+        ).values('names'),
+        output_field=TextField(),
+    )
+
+
+def search_vector():
+    """
+    Вектор рецепта: название важнее ингредиентов, ингредиенты
+    важнее описания.
+    """
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names(), Value(''),
+                     output_field=TextField()),
+            weight='B',
+            config=config,
+        )
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vector(recipe_ids=None):
+    """
+    Пересчитывает сохранённый вектор рецептов одним UPDATE.
+    recipe_ids может быть списком или подзапросом, без него
+    обновляются все рецепты.
+    """
+    if not search_enabled(router.db_for_write(Recipe)):
+        return 0
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    return recipes.update(search_vector=search_vector())
+
+
+def search_recipes(queryset, term):
+    """
+    Отбирает рецепты по запросу и упорядочивает их по релевантности.
+    На PostgreSQL используется GIN-индекс по search_vector, на SQLite
+    (тестовые запуски) — поиск подстроки с похожим ранжированием.
+    """
+    if search_enabled(queryset.db):
+        query = SearchQuery(
+            term,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+        ).order_by('-search_rank', '-id')
+    in_ingredients = Exists(RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk'), ingredient__name__icontains=term))
+    return queryset.filter(
+        Q(name__icontains=term) | Q(text__icontains=term) | in_ingredients
+    ).annotate(
+        search_rank=Case(
+            When(name__icontains=term, then=Value(1.0)),
+            When(in_ingredients, then=Value(0.4)),
+            default=Value(0.2),
+            output_field=FloatField(),
+        )
+    ).order_by('-search_rank', '-id')
@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .counters import change_counter
+from .feed import fan_out
+from .images import schedule_thumbnails, thumbnails_outdated
+from .models import (CartItem, Favorite, Ingredient, Recipe,
+                     RecipeIngredient, Subscription, Tag)
+from .recipe_ingredient_index import journal as ingredient_journal
+from .search import update_search_vector
+from .toggles import (cart_changed, favorites_changed, subscribed,
+                      unsubscribed)
+from .versioning import bump_version
+
+User = get_user_model()
+
+# Поля автора, которые входят в ответы с рецептами.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def bump_recipe_version(recipe_id):
+    bump_version(Recipe)
+    bump_version(Recipe, recipe_id)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def bump_catalog_version(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_recipe_version(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, raw=False, update_fields=None,
+                   **kwargs):
+    if created or raw or (update_fields is not None
+                          and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    recipe_ids = list(Recipe.objects.filter(
+        author=instance).values_list('pk', flat=True))
+    if recipe_ids:
+        bump_version(Recipe)
+    for recipe_id in recipe_ids:
+        bump_version(Recipe, recipe_id)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_recipe_version(instance.recipe_id)
+    ingredient_journal.mark([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_recipe_version(instance.pk)
+        return
+    bump_version(Recipe)
+    for recipe_id in pk_set or ():
+        bump_version(Recipe, recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw and thumbnails_outdated(instance):
+        schedule_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_saved(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if raw or (update_fields is not None
+               and not {'name', 'text'} & set(update_fields)):
+        return
+    update_search_vector([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    update_search_vector(RecipeIngredient.objects.filter(
+        ingredient=instance).values('recipe_id'))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'recipes_count', 1)
+        fan_out(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        favorites_changed([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    favorites_changed([instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=CartItem)
+def cart_item_created(sender, instance, created, **kwargs):
+    if created:
+        cart_changed([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=CartItem)
+def cart_item_deleted(sender, instance, **kwargs):
+    cart_changed([instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        subscribed(instance.subscriber_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    unsubscribed(instance.subscriber_id, instance.author_id)
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def content_hash(content):
+    """Возвращает sha256 содержимого файла, читая его по частям."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return bool(HASH_RE.match(stem))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — sha256 его содержимого:
+    images/ab/abcdef....jpg. Одинаковые файлы хранятся один раз,
+    а содержимое по ссылке никогда не меняется, поэтому её можно
+    кэшировать бессрочно.
+    """
+
+    def hashed_name(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Файл снова используется: обновляем время изменения, чтобы
+            # migrate_media не удалил его как давно не нужный, пока
+            # ссылающийся на него рецепт еще сохраняется.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
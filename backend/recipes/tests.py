@@ -0,0 +1,274 @@
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import recommendations
+from .counters import recount
+from .db_router import (REPLICA_DB_ALIAS, reads_from, replica_for,
+                        stick_to_primary)
+from .images import thumbnail_name
+from .ingredient_index import IngredientIndex
+from .journal import ChangeJournal
+from .management.commands.load_data import Command as LoadDataCommand
+from .models import Ingredient, JournalEntry, Recipe, RecipeNeighbor, Tag
+from .storage import ContentAddressedStorage
+from .toggles import (add_favorites, add_subscription, add_to_cart,
+                      remove_favorites, remove_from_cart, remove_subscription)
+from .versioning import bump_version, get_version
+
+User = get_user_model()
+
+
+class IngredientIndexTest(TestCase):
+
+    def test_rows_added_without_version_change_are_found(self):
+        index = IngredientIndex()
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.assertEqual(len(index.search('со', 10)), 1)
+        # bulk_create не меняет версию, как и запись из другого процесса
+        # при кэше, не общем для процессов.
+        Ingredient.objects.bulk_create([
+            Ingredient(name='Соус', measurement_unit='мл')])
+        self.assertEqual(
+            [item['name'] for item in index.search('со', 10)],
+            ['Соль', 'Соус'])
+
+
+class ReplicaRoutingTest(TestCase):
+    """Маршрутизация чтения между основной БД и репликой в файле SQLite."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            REPLICA_DB_ALIAS: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory.name, 'replica.sqlite3'),
+            },
+        })[REPLICA_DB_ALIAS]
+        connections.settings[REPLICA_DB_ALIAS] = replica
+        self.addCleanup(self.remove_replica)
+        with connections[REPLICA_DB_ALIAS].schema_editor() as editor:
+            editor.create_model(Tag)
+        Tag.objects.create(name='Основная', slug='primary', color='#000000')
+        Tag.objects.using(REPLICA_DB_ALIAS).create(
+            name='Реплика', slug='replica', color='#FFFFFF')
+        self.user = User.objects.create_user(
+            email='cook@example.com', username='cook', password='pass12345')
+
+    @staticmethod
+    def remove_replica():
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+
+    @staticmethod
+    def read_tags(user):
+        with reads_from(replica_for(user)):
+            return list(Tag.objects.values_list('name', flat=True))
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.read_tags(AnonymousUser()), ['Реплика'])
+        self.assertEqual(self.read_tags(self.user), ['Реплика'])
+
+    def test_writer_sticks_to_primary(self):
+        stick_to_primary(self.user)
+        self.assertEqual(self.read_tags(self.user), ['Основная'])
+        self.assertEqual(self.read_tags(AnonymousUser()), ['Реплика'])
+
+
+class LoadDataJsonTest(TestCase):
+
+    def test_items_are_read_in_chunks(self):
+        items = [{'name': f'Ингредиент {number}', 'measurement_unit': 'г'}
+                 for number in range(50)]
+        text = json.dumps(items, ensure_ascii=False, indent=1)
+        for chunk_size in (1, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(LoadDataCommand._read_json_array(
+                    io.StringIO(text), chunk_size)), items)
+
+    def test_invalid_json_is_rejected(self):
+        for text in ('', '{}', '[{"name": "Соль"}', '[{"name": "Соль"},'):
+            with self.subTest(text=text):
+                with self.assertRaises(CommandError):
+                    list(LoadDataCommand._read_json_array(
+                        io.StringIO(text), 4))
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def test_duplicate_save_refreshes_modified_time(self):
+        with tempfile.TemporaryDirectory() as location:
+            storage = ContentAddressedStorage(location=location)
+            name = storage.save('images/a.jpg', ContentFile(b'image'))
+            os.utime(storage.path(name), (0, 0))
+            self.assertEqual(
+                storage.save('images/b.jpg', ContentFile(b'image')), name)
+            self.assertGreater(os.path.getmtime(storage.path(name)), 0)
+
+
+class ThumbnailNameTest(TestCase):
+
+    def test_names_fit_image_fields(self):
+        image = Recipe._meta.get_field('image')
+        name = f'images/ab/{"a" * 64}.jpeg'
+        self.assertLessEqual(len(name), image.max_length)
+        for image_format in ('WEBP', 'JPEG'):
+            with override_settings(RECIPE_IMAGE_FORMAT=image_format):
+                for size in ('thumb', 'detail'):
+                    field = Recipe._meta.get_field(f'image_{size}')
+                    self.assertLessEqual(
+                        len(thumbnail_name(name, size)), field.max_length)
+
+
+class VersioningTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_evicted_version_does_not_repeat(self):
+        issued = {get_version(Tag)}
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(Tag)
+        issued.add(get_version(Tag))
+        # Вытеснение ключа из кэша, как при переполнении LocMemCache.
+        cache.clear()
+        self.assertNotIn(get_version(Tag), issued)
+
+    def test_version_changes_after_commit(self):
+        version = get_version(Tag)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(Tag)
+            self.assertEqual(get_version(Tag), version)
+        self.assertNotEqual(get_version(Tag), version)
+
+    def test_journal_is_written_after_commit(self):
+        journal = ChangeJournal('test')
+        with self.captureOnCommitCallbacks(execute=True):
+            journal.mark([1, 2])
+            self.assertEqual(journal.sequence(), 0)
+        self.assertEqual(journal.changes_since(0, journal.sequence()), {1, 2})
+
+    def test_journal_is_shared_through_database(self):
+        journal = ChangeJournal('test')
+        with self.captureOnCommitCallbacks(execute=True):
+            journal.mark([1, 2])
+        # Кэш другого процесса не содержит записей журнала.
+        cache.clear()
+        sequence = journal.sequence()
+        self.assertEqual(sequence, 2)
+        self.assertEqual(journal.changes_since(1, sequence), {2})
+
+    def test_journal_reset_requires_full_rebuild(self):
+        journal = ChangeJournal('test')
+        with self.captureOnCommitCallbacks(execute=True):
+            journal.mark([1])
+        start = journal.sequence()
+        with self.captureOnCommitCallbacks(execute=True):
+            journal.reset()
+            journal.mark([2])
+        self.assertIsNone(journal.changes_since(start, journal.sequence()))
+        self.assertEqual(
+            JournalEntry.objects.filter(journal='test').count(), 1)
+
+
+class RecommendationsBuildTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create(
+            User(email=f'user{number}@example.com', username=f'user{number}')
+            for number in range(3))
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(name=f'Рецепт {number}', text='Описание',
+                   author=cls.users[0], cooking_time=10,
+                   image='images/recipe.jpg')
+            for number in range(4))
+
+    def test_build_continues_from_saved_position(self):
+        recipe_ids = [recipe.pk for recipe in self.recipes]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users:
+                add_favorites(user, recipe_ids[:2])
+        self.assertTrue(recommendations.build(top_k=5)[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            add_favorites(self.users[0], recipe_ids[2:3])
+        # Позиция хранится в БД, а не в кэше процесса.
+        cache.clear()
+        updated, full = recommendations.build(top_k=5)
+        self.assertFalse(full)
+        # Изменённый рецепт и рецепты, у которых он стал соседом.
+        self.assertEqual(updated, 3)
+        self.assertTrue(RecipeNeighbor.objects.filter(
+            recipe_id=recipe_ids[2], neighbor_id=recipe_ids[0]).exists())
+
+
+class CounterConcurrencyTest(TransactionTestCase):
+    """Счетчики совпадают с данными после одновременных переключений."""
+    threads = 8
+    iterations = 40
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest(
+                'SQLite в памяти не ждет снятия блокировки при одновременной '
+                'записи: задайте DB_TEST_NAME.')
+        self.users = User.objects.bulk_create(
+            User(email=f'user{number}@example.com', username=f'user{number}')
+            for number in range(4))
+        self.recipes = Recipe.objects.bulk_create(
+            Recipe(name=f'Рецепт {number}', text='Описание',
+                   author=self.users[number % 2], cooking_time=10,
+                   image=f'images/recipe{number}.jpg')
+            for number in range(3))
+        # bulk_create не обновляет счетчики рецептов авторов.
+        recount()
+
+    def toggle(self, seed, errors):
+        operations = (
+            (add_favorites, remove_favorites),
+            (add_to_cart, remove_from_cart),
+        )
+        generator = random.Random(seed)
+        try:
+            for _ in range(self.iterations):
+                user = generator.choice(self.users)
+                add, remove = generator.choice(operations)
+                recipe_ids = [generator.choice(self.recipes).pk]
+                generator.choice((add, remove))(user, recipe_ids)
+                author_id = generator.choice(self.users[:2]).pk
+                if generator.random() < 0.5:
+                    add_subscription(user, author_id)
+                else:
+                    remove_subscription(user, author_id)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    def test_counters_match_after_concurrent_toggles(self):
+        errors = []
+        workers = [
+            threading.Thread(target=self.toggle, args=(seed, errors))
+            for seed in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(set(recount(dry_run=True).values()), {0})
@@ -0,0 +1,170 @@
+"""
+Избранное, корзина и подписки без гонок.
+
+Добавление - один запрос INSERT ... SELECT ... ON CONFLICT DO NOTHING,
+удаление - один запрос DELETE ... RETURNING. Повторный или одновременный
+запрос не приводит к IntegrityError: функции возвращают id только
+фактически добавленных или удаленных объектов, и счетчики изменяются
+по ним в той же транзакции.
+"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, router, transaction
+from django.db.models import Value
+from django.db.models.sql import DeleteQuery
+from django.utils import timezone
+
+from .counters import change_counter
+from .feed import backfill, prune
+from .models import CartItem, Favorite, Recipe, Subscription
+from .recommendations import journal as favorite_journal
+
+User = get_user_model()
+
+
+def _column(connection, model, field):
+    return connection.ops.quote_name(model._meta.get_field(field).column)
+
+
+def insert_ignore(model, target_field, targets, **values):
+    """
+    Добавляет строку для каждого объекта из targets: target_field - его
+    pk, остальные поля - из values. Существующие строки пропускаются.
+    Возвращает pk добавленных targets. Пустое условие (например,
+    pk__in=[]) не выполняет запрос.
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    fields = (target_field, *values)
+    rows = targets.order_by().values_list('pk', *(
+        Value(value, output_field=model._meta.get_field(name))
+        for name, value in values.items()
+    ))
+    try:
+        select, params = rows.query.get_compiler(using).as_sql()
+    except EmptyResultSet:
+        return []
+    columns = ', '.join(_column(connection, model, field) for field in fields)
+    sql = (
+        f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} '
+        f'({columns}) {select} ON CONFLICT DO NOTHING '
+        f'RETURNING {_column(connection, model, target_field)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_returning(queryset, field):
+    """Удаляет строки queryset одним запросом, возвращает их значения field."""
+    model = queryset.model
+    using = router.db_for_write(model)
+    connection = connections[using]
+    query = queryset.query.chain(DeleteQuery)
+    try:
+        sql, params = query.get_compiler(using).as_sql()
+    except EmptyResultSet:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{sql} RETURNING {_column(connection, model, field)}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def favorites_changed(recipe_ids, delta):
+    change_counter(Recipe, recipe_ids, 'favorites_count', delta)
+    favorite_journal.mark(recipe_ids)
+
+
+def cart_changed(recipe_ids, delta):
+    change_counter(Recipe, recipe_ids, 'in_cart_count', delta)
+
+
+def subscribed(subscriber_id, author_id):
+    change_counter(User, [author_id], 'subscribers_count', 1)
+    backfill(subscriber_id, author_id)
+
+
+def unsubscribed(subscriber_id, author_id):
+    change_counter(User, [author_id], 'subscribers_count', -1)
+    prune(subscriber_id, author_id)
+
+
+def add_favorites(user, recipe_ids):
+    with transaction.atomic(savepoint=False):
+        added = insert_ignore(
+            Favorite, 'recipe', Recipe.objects.filter(pk__in=recipe_ids),
+            user=user.pk)
+        favorites_changed(added, 1)
+    return added
+
+
+def remove_favorites(user, recipe_ids):
+    with transaction.atomic(savepoint=False):
+        removed = delete_returning(
+            Favorite.objects.filter(user=user, recipe_id__in=recipe_ids),
+            'recipe')
+        favorites_changed(removed, -1)
+    return removed
+
+
+def add_to_cart(user, recipe_ids):
+    with transaction.atomic(savepoint=False):
+        added = insert_ignore(
+            CartItem, 'recipe', Recipe.objects.filter(pk__in=recipe_ids),
+            user=user.pk, added_at=timezone.now())
+        cart_changed(added, 1)
+    return added
+
+
+def remove_from_cart(user, recipe_ids):
+    with transaction.atomic(savepoint=False):
+        removed = delete_returning(
+            CartItem.objects.filter(user=user, recipe_id__in=recipe_ids),
+            'recipe')
+        cart_changed(removed, -1)
+    return removed
+
+
+RECIPE_LISTS = {
+    Favorite: (add_favorites, remove_favorites),
+    CartItem: (add_to_cart, remove_from_cart),
+}
+
+
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное (Favorite) или корзину (CartItem)."""
+    add, _ = RECIPE_LISTS[model]
+    return add(user, recipe_ids)
+
+
+def remove_recipes(model, user, recipe_ids):
+    _, remove = RECIPE_LISTS[model]
+    return remove(user, recipe_ids)
+
+
+def add_subscription(subscriber, author_id):
+    """
+    Подписывает на автора. Возвращает False, если подписка уже есть,
+    автора нет или это сам пользователь.
+    """
+    with transaction.atomic(savepoint=False):
+        added = insert_ignore(
+            Subscription, 'author',
+            User.objects.filter(pk=author_id).exclude(pk=subscriber.pk),
+            subscriber=subscriber.pk)
+        for author_id in added:
+            subscribed(subscriber.pk, author_id)
+    return bool(added)
+
+
+def remove_subscription(subscriber, author_id):
+    """Отменяет подписку. Возвращает False, если подписки не было."""
+    with transaction.atomic(savepoint=False):
+        removed = delete_returning(
+            Subscription.objects.filter(
+                subscriber=subscriber, author_id=author_id),
+            'author')
+        for author_id in removed:
+            unsubscribed(subscriber.pk, author_id)
+    return bool(removed)
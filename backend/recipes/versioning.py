@@ -0,0 +1,60 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(model, pk=None):
+    if pk is None:
+        return f'recipes:{model._meta.model_name}:version'
+    return f'recipes:{model._meta.model_name}:{pk}:version'
+
+
+def _modified_key(model):
+    return f'recipes:{model._meta.model_name}:modified'
+
+
+def _new_version():
+    # Версия, вытесненная из кэша, не должна начинаться заново с уже
+    # выданного значения: иначе ETag и ключи кэша совпадут с выданными
+    # для старых данных.
+    return time.time_ns()
+
+
+def get_version(model, pk=None):
+    """
+    Возвращает текущую версию данных модели или, если передан pk,
+    отдельного объекта. Версия хранится в кэше и меняется при каждом
+    изменении данных.
+    """
+    key = _version_key(model, pk)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if cache.add(key, version, timeout=None) and pk is None:
+            cache.set(_modified_key(model), int(time.time()), timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def get_modified(model):
+    """Возвращает время последнего изменения данных модели (unix time)."""
+    return cache.get(_modified_key(model))
+
+
+def _bump_version(model, pk):
+    key = _version_key(model, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_version(), timeout=None)
+    if pk is None:
+        cache.set(_modified_key(model), int(time.time()), timeout=None)
+
+
+def bump_version(model, pk=None):
+    """
+    Меняет версию после коммита текущей транзакции: до него читатели
+    видят старые данные и могли бы сохранить их в кэш под новой версией.
+    """
+    transaction.on_commit(lambda: _bump_version(model, pk))